@@ -0,0 +1,123 @@
+"""
+author: Matthias Fussenegger
+
+Index of all documents (docids) of an NGRAMS file, which maps each docid
+to the numbers of its lines. Lines of a document do not have to be
+adjacent, they are read by number (see NgramsFile). The index is persisted
+as a sidecar file next to the NGRAMS file and is rebuilt only if the
+NGRAMS file has changed.
+"""
+from typing import Dict, List, Optional
+import os
+import tempfile
+
+INDEX_SUFFIX = ".docidx"
+INDEX_HEADER = "#docidx2"  # version 2 holds line numbers only
+
+
+# noinspection SpellCheckingInspection
+class DocidIndex:
+
+    def __init__(self, filename: str, index: Dict[str, List[int]]) -> None:
+        """
+        Creates a new index, use build or load instead.
+        :param filename: the file which is indexed.
+        :param index: maps each docid to its line numbers.
+        """
+        super().__init__()
+        self.__filename = filename
+        self.__index = index
+
+    def __len__(self) -> int:
+        return len(self.__index)
+
+    def __contains__(self, docid: str) -> bool:
+        return docid in self.__index
+
+    def get_docids(self) -> List[str]:
+        """
+        :return: all docids in order of their first occurrence.
+        """
+        return list(self.__index.keys())
+
+    def get_line_numbers(self, docid: str) -> List[int]:
+        return self.__index[docid]
+
+    def save(self) -> Optional[str]:
+        """
+        Writes the index to its sidecar file, first to a temporary file
+        which then replaces the sidecar file, so that concurrent readers
+        never see an incomplete index.
+        :return: the name of the sidecar file or None if it could not be
+        written (e.g. read-only location).
+        """
+        stat = os.stat(self.__filename)
+        index_file = self.__filename + INDEX_SUFFIX
+        tmp_file = None
+        try:
+            fd, tmp_file = tempfile.mkstemp(
+                suffix=".tmp", prefix=os.path.basename(index_file),
+                dir=os.path.dirname(os.path.abspath(index_file)))
+            with open(fd, "w", encoding="utf-8") as out_file:
+                out_file.write("%s\t%d\t%d\n" % (
+                    INDEX_HEADER, stat.st_size, stat.st_mtime_ns))
+                for docid, line_nums in self.__index.items():
+                    out_file.write(docid + "\t"
+                                   + ",".join(map(str, line_nums)) + "\n")
+            os.replace(tmp_file, index_file)
+        except OSError:
+            if tmp_file is not None and os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return None  # index is only kept in memory
+
+        return index_file
+
+    @staticmethod
+    def __parse_docid(line: bytes) -> bytes:
+        fields = line.split(b"\t", 3)
+        if len(fields) > 2:  # NGRAMS file, docid is third column
+            return fields[2]
+        return fields[0].strip()  # file with one docid per line
+
+    @staticmethod
+    def build(filename: str, encoding: str = "utf-8"):
+        """
+        Builds the index in a single pass over the specified file.
+        :param filename: the file to be indexed.
+        :param encoding: encoding of the file.
+        :return: an instance of this class.
+        """
+        index = {}
+        with open(filename, "rb") as file:
+            for line_num, line in enumerate(file):
+                if not line.isspace():
+                    docid = DocidIndex.__parse_docid(line).decode(encoding)
+                    index.setdefault(docid, []).append(line_num)
+
+        return DocidIndex(filename, index)
+
+    @staticmethod
+    def load(filename: str, encoding: str = "utf-8"):
+        """
+        Loads the index from its sidecar file. If there is no sidecar
+        file or the indexed file has changed, the index is built and
+        written to the sidecar file.
+        :param filename: the file to be indexed.
+        :param encoding: encoding of the file.
+        :return: an instance of this class.
+        """
+        stat = os.stat(filename)
+        header = "%s\t%d\t%d" % (INDEX_HEADER, stat.st_size, stat.st_mtime_ns)
+        index_file = filename + INDEX_SUFFIX
+        if os.path.exists(index_file):
+            with open(index_file, "r", encoding="utf-8") as in_file:
+                if in_file.readline().rstrip("\n") == header:
+                    index = {}
+                    for line in in_file:
+                        docid, line_nums = line.rstrip("\n").split("\t")
+                        index[docid] = [int(n) for n in line_nums.split(",")]
+                    return DocidIndex(filename, index)
+
+        doc_index = DocidIndex.build(filename, encoding)
+        doc_index.save()
+        return doc_index
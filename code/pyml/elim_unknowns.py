@@ -2,14 +2,32 @@
 author: Matthias Fussenegger
 """
 import sys
+import numpy as np
+
+from ngrams_reader import open_ngrams
+from ngrams_store import NgramsStore, UNK_LABEL, is_store
 
 f1 = sys.argv[1]
 f2 = sys.argv[2]
 pr = sys.argv[3]  # percentage of labels to eliminate
 
-with open(f1, "r", encoding="utf-8") as file:
-    l1 = file.readlines()
+if is_store(f1):  # eliminate by label ids without parsing any lines
+    s1 = NgramsStore.load(f1)
+    unk = s1.get_label_id(UNK_LABEL)
+    is_unk = (s1.labels[:, 0] == unk) if s1.labels.shape[1] == 1 \
+        else np.zeros(len(s1), dtype=bool)
+    us = np.count_nonzero(is_unk) * (float(pr) / 100)
+    skip = is_unk & (np.cumsum(is_unk) <= np.ceil(us))
+    s2 = s1.select(~skip)
+    if is_store(f2):
+        s2.save(f2)
+    else:
+        with open(f2, "w", encoding="utf-8", newline="\r\n") as file:
+            for line in s2:
+                file.write(line)
+    sys.exit(0)
 
+l1 = open_ngrams(f1)  # memory-mapped or read from archive
 uc = 0
 
 for line in l1:
@@ -18,17 +36,11 @@ for line in l1:
 
 us = uc * (float(pr) / 100)
 c = 0
-l2 = []
-
-for line in l1:
-    if "\tUNKNOWN\t" in line:
-        if c >= us:  # don't skip anymore
-            l2.append(line)
-        else:  # skip
-            c += 1
-    else:
-        l2.append(line)
 
-with open(f2, "w", encoding="utf-8") as file:
-    for line in l2:
-        file.write(line)
+with open(f2, "wb") as file:
+    for i, line in enumerate(l1):
+        if "\tUNKNOWN\t" in line:
+            if c < us:  # skip
+                c += 1
+                continue
+        file.write(l1.get_bytes(i, i + 1))  # write line as it is stored
@@ -1,98 +1,421 @@
 """
 author: Matthias Fussenegger
+
+Compares actual with predicted labels token by token. Can be imported
+(see compare_files) or run as script, which prints the report:
+python file_compare.py <actual> <predicted> [stream] [max_diff_lines]
+
+In streaming mode, both files are read block by block, so memory does not
+grow with the size of the files. Different lines are either spooled to a
+temporary file or, if max_diff_lines is specified, sampled uniformly.
+
+Reports written by write_report are accompanied by a sidecar (.npz) which
+holds all counts, scores, the confusion matrix and the label ids of each
+token, so that results can be read without parsing the report.
 """
+from itertools import islice, zip_longest
+from random import Random
+from typing import Iterator, List, Optional, Sequence, TextIO, Tuple
+import shutil
 import sys
+import os
+import tempfile
+
+import numpy as np
 
 UNK_LABEL = "unbekannt"
+BLOCK_LINES = 10000  # lines compared at once in streaming mode
+SIDECAR_SUFFIX = ".npz"
+
+# counts and scores stored in the sidecar
+COUNTS = ("total_tokens", "diff_count", "count_unk", "true_positives",
+          "true_negatives", "false_positives", "false_negatives")
+SCORES = ("acc_total", "acc_excl_unk", "precision", "recall", "f1_score")
+
+
+# noinspection SpellCheckingInspection
+class CompareResult:
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.labels: List[str] = []  # label of each id
+        self.actual_ids = np.zeros(0, dtype=np.int32)  # per token
+        self.predicted_ids = np.zeros(0, dtype=np.int32)  # per token
+        self.confusion = np.zeros((0, 0), dtype=np.int64)  # actual x predicted
+        self.total_tokens = 0
+        self.diff_count = 0
+        self.count_unk = 0
+        self.true_positives = 0
+        self.true_negatives = 0
+        self.false_positives = 0
+        self.false_negatives = 0
+        self.acc_total = 0.0
+        self.acc_excl_unk = 0.0
+        self.precision = 0.0
+        self.recall = 0.0
+        self.f1_score = 0.0
+        self.diff_lines: List[str] = []
+
+    def add(self, other) -> None:
+        """
+        Adds all counts of another result (e.g. of the next block of
+        lines) and updates the scores. Per-token ids and different lines
+        of the other result are not added.
+        :param other: the result to be added.
+        """
+        new_labels = [label for label in other.labels
+                      if label not in self.labels]
+        if len(new_labels) != 0:  # grow confusion matrix
+            num_labels = len(self.labels) + len(new_labels)
+            confusion = np.zeros((num_labels, num_labels), dtype=np.int64)
+            confusion[:len(self.labels), :len(self.labels)] = self.confusion
+            self.labels = self.labels + new_labels
+            self.confusion = confusion
+        ids = [self.labels.index(label) for label in other.labels]
+        self.confusion[np.ix_(ids, ids)] += other.confusion
+        self.total_tokens += other.total_tokens
+        self.diff_count += other.diff_count
+        self.count_unk += other.count_unk
+        self.true_positives += other.true_positives
+        self.true_negatives += other.true_negatives
+        self.false_positives += other.false_positives
+        self.false_negatives += other.false_negatives
+        self.__calc_scores()
+
+    def get_label_id(self, label: str) -> int:
+        """
+        :return: the id of the label or -1 if there is no such label.
+        """
+        return self.labels.index(label) if label in self.labels else -1
+
+    def get_label_scores(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Calculates precision, recall and F1-score of each label from the
+        confusion matrix. Scores with a denominator of zero are zero.
+        :return: tuple of (precision, recall, F1-score), indexed by label id.
+        """
+        hits = np.diag(self.confusion).astype(np.float64)
+        predicted = self.confusion.sum(axis=0)
+        actual = self.confusion.sum(axis=1)
+        precision = np.divide(hits, predicted, out=np.zeros_like(hits),
+                              where=predicted != 0)
+        recall = np.divide(hits, actual, out=np.zeros_like(hits),
+                           where=actual != 0)
+        total = precision + recall
+        f1_score = np.divide(2 * precision * recall, total,
+                             out=np.zeros_like(hits), where=total != 0)
+        return precision, recall, f1_score
+
+    def to_txt(self) -> str:
+        """
+        :return: the report, which also lists all lines that are different.
+        """
+        lines = ["\n",
+                 "Total tokens: %s" % str(self.total_tokens),
+                 "Different tokens: %s" % str(self.diff_count),
+                 "\nLabels (excl. '%s') present: %s " % (
+                     UNK_LABEL, str(self.total_tokens - self.count_unk)),
+                 "\nAccuracy (Total): %s" % str(self.acc_total),
+                 "Accuracy (excl. Unknown): %s" % str(self.acc_excl_unk),
+                 "\nMatches (excluding '%s'): %s" % (
+                     UNK_LABEL, str(self.true_positives)),
+                 "Matches (including '%s'): %s" % (
+                     UNK_LABEL, str(self.true_negatives + self.true_positives)),
+                 "\nF1-Score: %s" % str(self.f1_score),
+                 "\nDifferent:",
+                 "================"]
+        lines.extend(self.diff_lines)
+        return "\n".join(lines) + "\n"
+
+    def save(self, filename: str) -> None:
+        """
+        Writes everything except the different lines to a compressed
+        NPZ file.
+        :param filename: the file to be written (should end with .npz).
+        """
+        arrays = {name: np.int64(getattr(self, name)) for name in COUNTS}
+        arrays.update({name: np.float64(getattr(self, name))
+                       for name in SCORES})
+        tmp_file = filename + ".tmp" + SIDECAR_SUFFIX
+        np.savez_compressed(tmp_file, labels=np.array(self.labels, dtype=str),
+                 confusion=self.confusion, actual_ids=self.actual_ids,
+                 predicted_ids=self.predicted_ids, **arrays)
+        os.replace(tmp_file, filename)  # never leave a partial file
+
+    @staticmethod
+    def load(filename: str, load_ids: bool = True):
+        """
+        Reads a result written by save.
+        :param filename: the file to be read.
+        :param load_ids: false to skip the label ids of each token.
+        :return: an instance of this class.
+        """
+        result = CompareResult()  # to be returned
+        with np.load(filename) as data:  # arrays are read on access
+            result.labels = data["labels"].tolist()
+            result.confusion = data["confusion"]
+            if load_ids:
+                result.actual_ids = data["actual_ids"]
+                result.predicted_ids = data["predicted_ids"]
+            for name in COUNTS:
+                setattr(result, name, int(data[name]))
+            for name in SCORES:
+                setattr(result, name, float(data[name]))
+
+        return result
+
+    @staticmethod
+    def from_ids(labels: List[str], actual_ids: np.ndarray,
+                 predicted_ids: np.ndarray):
+        """
+        Factory method which calculates all measures in one vectorized pass.
+        :param labels: label of each id.
+        :param actual_ids: actual label id of each token.
+        :param predicted_ids: predicted label id of each token.
+        :return: an instance of this class.
+        """
+        result = CompareResult()  # to be returned
+        result.labels = labels
+        result.actual_ids = actual_ids
+        result.predicted_ids = predicted_ids
+        num_labels = len(labels)
+        result.confusion = np.bincount(
+            actual_ids.astype(np.int64) * num_labels + predicted_ids,
+            minlength=num_labels * num_labels).reshape(num_labels, num_labels)
+
+        is_unk = np.array([label.startswith(UNK_LABEL) for label in labels],
+                          dtype=bool)
+        act_unk = is_unk[actual_ids]
+        prd_unk = is_unk[predicted_ids]
+        is_diff = actual_ids != predicted_ids
+
+        result.total_tokens = len(actual_ids)
+        result.diff_count = int(np.count_nonzero(is_diff))
+        result.count_unk = int(np.count_nonzero(act_unk))
+        result.false_negatives = int(np.count_nonzero(is_diff & prd_unk))
+        result.false_positives = result.diff_count - result.false_negatives
+        result.true_negatives = int(np.count_nonzero(~is_diff & act_unk))
+        result.true_positives = int(np.count_nonzero(~is_diff & ~act_unk))
+        result.__calc_scores()
+
+        return result
+
+    def __calc_scores(self) -> None:
+        count_not_unk = self.total_tokens - self.count_unk
+        if self.total_tokens != 0:
+            self.acc_total = (self.total_tokens - self.diff_count) \
+                             / float(self.total_tokens)
+        if count_not_unk != 0:
+            self.acc_excl_unk = self.true_positives / float(count_not_unk)
+
+        # precision and recall (excluding "unknown" only label(s))
+        tp_fp = float(self.true_positives) + self.false_positives
+        tp_fn = float(self.true_positives) + self.false_negatives
+        self.precision = self.true_positives / tp_fp if tp_fp != 0 else 0.0
+        self.recall = self.true_positives / tp_fn if tp_fn != 0 else 0.0
+        precision, recall = self.precision, self.recall
+        if precision == 0 and recall == 0:
+            precision = recall = -1
+        self.f1_score = 2 * ((precision * recall) / (precision + recall))
 
-f1 = sys.argv[1]  # actual labels
-f2 = sys.argv[2]  # predicted labels
-
-with open(f1, "r", encoding="utf-8") as file:
-    actual_l = file.readlines()
-
-with open(f2, "r", encoding="utf-8") as file:
-    predicted_l = file.readlines()
-
-false_positives = 0
-false_negatives = 0
-true_positives = 0
-true_negatives = 0
-
-diff_count = 0
-count_unk = 0
-total_tokens = 0
-diff_lines = []
-
-for i, line in enumerate(actual_l):
-    if line.isspace():
-        continue  # skip empty lines
-
-    actual = str(line)  # copy
-    actual = actual.replace("\n", "")
-    actual = actual.replace("\r", "")
-
-    prediction = str(predicted_l[i])
-    prediction = prediction.replace("\n", "")
-    prediction = prediction.replace("\r", "")
-
-    act_labels = actual.split()  # split on whitespace
-    prd_labels = prediction.split()  # split on whitespace
-
-    for ii, act_label in enumerate(act_labels):
-        total_tokens += 1
-        if act_label.startswith(UNK_LABEL):
-            count_unk += 1
-        prd_label = prd_labels[ii]
-        # check equality of lines
-        if act_label != prd_label:
-            diff_count += 1
-            out_line = act_label + " / " + prd_label + \
-                       "\t" + actual + " / " + prediction
-            diff_lines.append(out_line)
-            if prd_label.startswith(UNK_LABEL):
-                false_negatives += 1
+
+def read_lines(filename: str, encoding: str = "utf-8") -> List[str]:
+    with open(filename, "r", encoding=encoding) as file:
+        lines = file.readlines()
+
+    return lines
+
+
+def compare(actual_l: Sequence[str], predicted_l: Sequence[str],
+            first_line: int = 1) -> CompareResult:
+    """
+    Compares the labels of each line token by token. Empty lines of the
+    actual labels are skipped.
+    :param actual_l: lines of actual labels.
+    :param predicted_l: lines of predicted labels (same line numbers).
+    :param first_line: number of the first line (for error messages).
+    :return: the result of the comparison.
+    """
+    label_ids = {}  # maps each label to its id
+    pair_ids = {}  # maps each distinct pair of lines to its number
+    pair_act = []  # actual label ids of each pair
+    pair_prd = []  # predicted label ids of each pair
+    line_nums = []
+    line_pairs = []
+
+    # lines repeat a lot, so each distinct pair of lines is only split once
+    for i, line in enumerate(actual_l):
+        if line.isspace():
+            continue  # skip empty lines
+        if i >= len(predicted_l):  # e.g. truncated prediction file
+            raise ValueError("Missing predictions in line %d"
+                             % (i + first_line))
+        pair = (line, predicted_l[i])
+        pair_id = pair_ids.get(pair)
+        if pair_id is None:
+            actual = line.split()  # split on whitespace
+            prediction = pair[1].split()
+            if len(prediction) < len(actual):
+                raise ValueError("Missing predictions in line %d"
+                                 % (i + first_line))
+            pair_id = len(pair_act)
+            pair_ids[pair] = pair_id
+            pair_act.append([label_ids.setdefault(label, len(label_ids))
+                             for label in actual])
+            pair_prd.append([label_ids.setdefault(label, len(label_ids))
+                             for label in prediction[:len(actual)]])
+        line_nums.append(i)
+        line_pairs.append(pair_id)
+
+    # gather the label ids of all tokens from the pairs of all lines
+    pair_lens = np.array([len(ids) for ids in pair_act], dtype=np.int64)
+    pair_starts = np.cumsum(pair_lens) - pair_lens
+    line_pairs = np.array(line_pairs, dtype=np.int64)
+    line_lens = pair_lens[line_pairs]
+    line_starts = np.cumsum(line_lens) - line_lens
+    token_pos = np.arange(int(line_lens.sum())) \
+        - np.repeat(line_starts, line_lens)
+    token_idx = np.repeat(pair_starts[line_pairs], line_lens) + token_pos
+    flat_act = np.array([i for ids in pair_act for i in ids], dtype=np.int32)
+    flat_prd = np.array([i for ids in pair_prd for i in ids], dtype=np.int32)
+    result = CompareResult.from_ids(list(label_ids.keys()),
+                                    flat_act[token_idx], flat_prd[token_idx])
+
+    # only build the lines of different tokens
+    labels = result.labels
+    token_lines = np.repeat(np.array(line_nums, dtype=np.int64), line_lens)
+    for idx in np.flatnonzero(result.actual_ids != result.predicted_ids):
+        i = token_lines[idx]
+        actual = actual_l[i].replace("\n", "").replace("\r", "")
+        prediction = predicted_l[i].replace("\n", "").replace("\r", "")
+        result.diff_lines.append(labels[result.actual_ids[idx]] + " / "
+                                 + labels[result.predicted_ids[idx]] + "\t"
+                                 + actual + " / " + prediction)
+
+    return result
+
+
+def compare_files(actual_file: str, predicted_file: str) -> CompareResult:
+    return compare(read_lines(actual_file), read_lines(predicted_file))
+
+
+class DiffSampler:
+    """
+    Keeps a uniform sample of at most max_lines of all offered lines
+    (reservoir sampling), which are returned in their original order.
+    """
+
+    def __init__(self, max_lines: int, rnd: Random = None) -> None:
+        super().__init__()
+        self.__max_lines = max_lines
+        self.__rnd = rnd if rnd is not None else Random(0)  # reproducible
+        self.__sample: List[Tuple[int, str]] = []
+        self.__count = 0
+
+    def offer(self, line: str) -> None:
+        if len(self.__sample) < self.__max_lines:
+            self.__sample.append((self.__count, line))
+        else:
+            idx = self.__rnd.randrange(0, self.__count + 1)
+            if idx < self.__max_lines:
+                self.__sample[idx] = (self.__count, line)
+        self.__count += 1
+
+    def get_lines(self) -> List[str]:
+        return [line for _, line in sorted(self.__sample)]
+
+
+def iter_blocks(actual_file: str, predicted_file: str,
+                encoding: str = "utf-8") -> Iterator[Tuple[List[str], List[str]]]:
+    """
+    Reads both files in blocks of lines. Missing lines are empty.
+    :return: an iterator over tuples of (actual lines, predicted lines).
+    """
+    with open(actual_file, "r", encoding=encoding) as act_file, \
+            open(predicted_file, "r", encoding=encoding) as prd_file:
+        pairs = zip_longest(act_file, prd_file, fillvalue="")
+        while True:
+            block = list(islice(pairs, BLOCK_LINES))
+            if len(block) == 0:
+                break
+            actual_l, predicted_l = zip(*block)
+            yield actual_l, predicted_l
+
+
+def compare_stream(actual_file: str, predicted_file: str,
+                   diff_out: TextIO = None,
+                   max_diff_lines: Optional[int] = None) -> CompareResult:
+    """
+    Compares the files block by block with constant memory. Different
+    lines are written to diff_out as soon as they are found. Otherwise,
+    they are kept in the result, sampled if max_diff_lines is specified.
+    The result does not hold any per-token ids.
+    :param actual_file: file of actual labels.
+    :param predicted_file: file of predicted labels.
+    :param diff_out: where to write the different lines to, optional.
+    :param max_diff_lines: maximum number of different lines to be kept.
+    :return: the result of the comparison.
+    """
+    result = CompareResult()  # to be returned
+    sampler = DiffSampler(max_diff_lines) \
+        if diff_out is None and max_diff_lines is not None else None
+    first_line = 1
+
+    for actual_l, predicted_l in iter_blocks(actual_file, predicted_file):
+        block_result = compare(actual_l, predicted_l, first_line)
+        result.add(block_result)
+        first_line += len(actual_l)
+        for line in block_result.diff_lines:
+            if diff_out is not None:
+                diff_out.write(line + "\n")
+            elif sampler is not None:
+                sampler.offer(line)
             else:
-                false_positives += 1
-        elif act_label.startswith(UNK_LABEL) and \
-                prd_label.startswith(UNK_LABEL):
-            true_negatives += 1  # correct "unknown"
-        else:  # score without "unknown" only label(s)
-            true_positives += 1
+                result.diff_lines.append(line)
+
+    if sampler is not None:
+        result.diff_lines = sampler.get_lines()
 
-count_not_unk = total_tokens - count_unk
+    return result
 
-print("\n")
-print("Total tokens: %s" % str(total_tokens))
-print("Different tokens: %s" % str(diff_count))
-print("\nLabels (excl. '%s') present: %s " % (UNK_LABEL, str(count_not_unk)))
 
-acc_nn = 0.0
-acc_eu = 0.0
+def get_sidecar_name(report_file: str) -> str:
+    """
+    :return: name of the sidecar of a report, e.g. comp_dev.npz.
+    """
+    return os.path.splitext(report_file)[0] + SIDECAR_SUFFIX
 
-if total_tokens != 0:
-    acc_nn = (total_tokens - diff_count) / float(total_tokens)
 
-if count_not_unk != 0:
-    acc_eu = true_positives / float(count_not_unk)
+def write_report(filename: str, result: CompareResult) -> None:
+    """
+    Writes the report and its sidecar.
+    """
+    with open(filename, "w", encoding="utf-8") as out_file:
+        out_file.write(result.to_txt())
+    result.save(get_sidecar_name(filename))
 
-print("\nAccuracy (Total): %s" % str(acc_nn))
-print("Accuracy (excl. Unknown): %s" % str(acc_eu))
 
-print("\nMatches (excluding '%s'): %s" % (UNK_LABEL, str(true_positives)))
-print("Matches (including '%s'): %s" % (UNK_LABEL, str(true_negatives + true_positives)))
+def main():
+    f1 = sys.argv[1]  # actual labels
+    f2 = sys.argv[2]  # predicted labels
+    # compare with constant memory (optional)
+    stream = len(sys.argv) > 3 and sys.argv[3].lower() == "true"
+    # sample different lines instead of listing all (optional)
+    max_diff_lines = int(sys.argv[4]) if len(sys.argv) > 4 else None
 
-# precision and recall
-precision = true_positives / (float(true_positives) + false_positives)
-recall = true_positives / (float(true_positives) + false_negatives)
-if precision == 0 and recall == 0:
-    precision = recall = -1
-f1_score = 2 * ((precision * recall) / (precision + recall))
+    if not stream:
+        result = compare_files(f1, f2)
+        print(result.to_txt(), end="")
+    elif max_diff_lines is not None:
+        result = compare_stream(f1, f2, max_diff_lines=max_diff_lines)
+        print(result.to_txt(), end="")
+    else:  # report comes first, so spool different lines until done
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as diff_file:
+            result = compare_stream(f1, f2, diff_out=diff_file)
+            print(result.to_txt(), end="")
+            diff_file.seek(0)
+            shutil.copyfileobj(diff_file, sys.stdout)
 
-print("\nF1-Score: %s" % str(f1_score))
 
-# print all lines that are different
-print("\nDifferent:")
-print("================")
-for line in diff_lines:
-    print(line)
+if __name__ == "__main__":
+    main()
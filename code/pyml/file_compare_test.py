@@ -0,0 +1,56 @@
+"""
+author: Matthias Fussenegger
+"""
+import os
+import tempfile
+import unittest
+
+import file_compare
+import nmt_runner
+
+
+class FileCompareTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.__tmp_dir = tempfile.TemporaryDirectory()
+        self.actual_file = self.__write("act.txt", ["unbekannt datum\n",
+                                                    "betrag unbekannt\n",
+                                                    "unbekannt unbekannt\n"])
+        self.predicted_file = self.__write("prd.txt", ["unbekannt datum\n",
+                                                       "betrag betrag\n"])
+
+    def tearDown(self) -> None:
+        self.__tmp_dir.cleanup()
+
+    def __write(self, name: str, lines) -> str:
+        filename = os.path.join(self.__tmp_dir.name, name)
+        with open(filename, "w", encoding="utf-8") as file:
+            file.writelines(lines)
+        return filename
+
+    def testShortPredictionFile(self):
+        with self.assertRaisesRegex(ValueError, "Missing predictions"):
+            file_compare.compare_files(self.actual_file, self.predicted_file)
+
+    def testShortPredictionFileStream(self):
+        with self.assertRaisesRegex(ValueError, "Missing predictions"):
+            file_compare.compare_stream(self.actual_file, self.predicted_file)
+
+    def testTrailingBlankLines(self):
+        # blank lines at the end of the actual labels need no predictions
+        actual_file = self.__write("act_blank.txt", ["a b\n", "c d\n", "\n"])
+        predicted_file = self.__write("prd_blank.txt", ["a b\n", "c x\n"])
+        result = file_compare.compare_files(actual_file, predicted_file)
+        stream_result = file_compare.compare_stream(actual_file, predicted_file)
+        self.assertEqual((4, 1), (result.total_tokens, result.diff_count))
+        self.assertEqual(result.to_txt(), stream_result.to_txt())
+
+    def testShortPredictionFileRunner(self):
+        # a single truncated fold must not abort the runner
+        out = os.path.join(self.__tmp_dir.name, "comp.txt")
+        self.assertFalse(nmt_runner.compare_output(
+            "file_compare.py", self.actual_file, self.predicted_file, out))
+
+
+if __name__ == "__main__":
+    unittest.main()
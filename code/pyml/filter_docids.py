@@ -2,30 +2,57 @@
 author: Matthias Fussenegger
 """
 import sys
-import re
+import numpy as np
 
-RE_DOC = re.compile(r"\w{40}")  # SHA-1 (40 chars)
+from docid_index import DocidIndex
+from ngrams_reader import NgramsFile, is_compressed, iter_raw_lines
+from ngrams_store import NgramsStore, is_store
 
 docids_file = sys.argv[1]
 filter_file = sys.argv[2]
 target_file = sys.argv[3]
 
-with open(docids_file, "r", encoding="utf-8") as f:
-    docs = f.readlines()
-
 with open(filter_file, "r", encoding="utf-8") as f:
     filters = f.readlines()
 
 filters = [f.replace("\r", "").replace("\n", "") for f in filters]
 docid_filter = set(filters)
-docs_target = []
 
-for i, doc in enumerate(docs):
-    if doc.isspace():
-        continue
-    docid = RE_DOC.search(doc).group(0)
-    if docid in docid_filter:
-        docs_target.append(doc)
+if is_store(docids_file):  # filter by docid ids, order of rows is kept
+    store = NgramsStore.load(docids_file)
+    ids = [i for i, docid in enumerate(store.docid_dict)
+           if docid in docid_filter]
+    filtered = store.select(np.isin(store.docids, ids))
+    if is_store(target_file):
+        filtered.save(target_file)
+    else:
+        with open(target_file, "w", encoding="utf-8", newline="\r\n") as f:
+            for line in filtered:
+                f.write(line)
+    sys.exit(0)
+
+if is_compressed(docids_file):  # stream lines, there is no index to use
+    with open(target_file, "wb") as f:
+        for line in iter_raw_lines(docids_file):
+            if line.isspace():
+                continue
+            fields = line.split(b"\t", 3)
+            docid = fields[2] if len(fields) > 2 else fields[0].strip()
+            if docid.decode("utf-8") in docid_filter:
+                f.write(line)
+    sys.exit(0)
+
+# both indexes are cached next to the docids file
+doc_index = DocidIndex.load(docids_file)
+docs = NgramsFile(docids_file)
+line_nums = []
+
+for docid in docid_filter:
+    if docid in doc_index:
+        line_nums.extend(doc_index.get_line_numbers(docid))
+
+line_nums.sort()  # keep order of lines in docids file
 
-with open(target_file, "w", encoding="utf-8") as f:
-    f.writelines(docs_target)
+with open(target_file, "wb") as f:
+    for line_num in line_nums:
+        f.write(docs.get_bytes(line_num, line_num + 1))
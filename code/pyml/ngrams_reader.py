@@ -0,0 +1,285 @@
+"""
+author: Matthias Fussenegger
+
+Memory-mapped access to the lines of (NGRAMS) text files. The byte offsets
+of all lines are kept in a NumPy array, which is cached next to the file,
+so that lines can be accessed by number and ranges of lines can be sliced
+without copying them.
+
+Compressed files (.zip or .gz) are streamed line by line instead, without
+extracting them to disk. The lines of all members of a ZIP archive are
+read in the order of the members.
+"""
+from typing import Iterator, List, Optional, Union
+import gzip
+import mmap
+import os
+import tempfile
+import zipfile
+import numpy as np
+
+INDEX_SUFFIX = ".lidx.npy"
+COMPRESSED_SUFFIXES = (".zip", ".gz")
+BLOCK_SIZE = 1 << 26  # bytes scanned at once when building the index
+NEWLINE = 10  # b"\n"
+
+
+# noinspection SpellCheckingInspection
+class NgramRecord:
+    """
+    A single parsed line of an NGRAMS file, which is structured as
+    <src tokens> \t <labels> \t <docid> \t <bbox> \t ... \t <bbox> \t
+    """
+    __slots__ = ("src", "labels", "docid", "bbox")
+
+    def __init__(self, src: str, labels: List[str],
+                 docid: str, bbox: str) -> None:
+        super().__init__()
+        self.src = src
+        self.labels = labels
+        self.docid = docid
+        self.bbox = bbox
+
+    @staticmethod
+    def parse(line: str):
+        fields = line.rstrip("\r\n").split("\t")
+        assert len(fields) > 3
+        return NgramRecord(src=fields[0].rstrip(" "),
+                           labels=fields[1].split(" "),
+                           docid=fields[2],
+                           bbox="\t".join(fields[3:]))
+
+
+class NgramsFile:
+
+    def __init__(self, filename: str, encoding: str = "utf-8") -> None:
+        """
+        Opens and memory-maps the specified file. Lines are split at line
+        feeds only and keep their line terminators.
+        :param filename: the file to be opened.
+        :param encoding: encoding of the file.
+        """
+        super().__init__()
+        self.__filename = filename
+        self.__encoding = encoding
+        self.__file = open(filename, "rb")
+        if os.fstat(self.__file.fileno()).st_size != 0:
+            self.__buffer = mmap.mmap(self.__file.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+        else:  # empty files cannot be mapped
+            self.__buffer = b""
+        self.__offsets = NgramsFile.__load_offsets(filename, self.__buffer)
+
+    def __getstate__(self):
+        # only the name is passed to other processes, which map the file again
+        return self.__filename, self.__encoding
+
+    def __setstate__(self, state) -> None:
+        self.__init__(*state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.__offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        return self.get_bytes(idx, idx + 1).tobytes().decode(self.__encoding)
+
+    def __iter__(self) -> Iterator[str]:
+        for idx in range(0, len(self)):
+            yield self[idx]
+
+    def get_filename(self) -> str:
+        return self.__filename
+
+    def get_record(self, idx: int) -> Optional[NgramRecord]:
+        """
+        :return: the parsed line or None if the line is empty.
+        """
+        line = self[idx]
+        return NgramRecord.parse(line) if not line.isspace() else None
+
+    def get_offsets(self) -> np.ndarray:
+        """
+        :return: byte offsets of all lines, followed by the file size.
+        """
+        return self.__offsets
+
+    def get_bytes(self, start: int, stop: int) -> memoryview:
+        """
+        Returns the lines [start, stop) without copying them.
+        :param start: number of the first line.
+        :param stop: number of the line after the last line.
+        :return: a view of the mapped file.
+        """
+        if start < 0 or stop > len(self) or start > stop:
+            raise IndexError("line range out of range")
+        return memoryview(self.__buffer)[
+               int(self.__offsets[start]):int(self.__offsets[stop])]
+
+    def close(self) -> None:
+        if isinstance(self.__buffer, mmap.mmap):
+            self.__buffer.close()
+        self.__file.close()
+
+    @staticmethod
+    def __build_offsets(buffer) -> np.ndarray:
+        size = len(buffer)
+        ends = [np.zeros(1, dtype=np.int64)]  # first line starts at zero
+        for start in range(0, size, BLOCK_SIZE):
+            block = np.frombuffer(buffer, dtype=np.uint8,
+                                  count=min(BLOCK_SIZE, size - start),
+                                  offset=start)
+            ends.append(np.flatnonzero(block == NEWLINE) + (start + 1))
+        offsets = np.concatenate(ends).astype(np.int64)
+        if offsets[-1] != size:  # last line without line feed
+            offsets = np.append(offsets, size)
+        return offsets
+
+    @staticmethod
+    def __load_offsets(filename: str, buffer) -> np.ndarray:
+        """
+        Loads the line offsets from the cached index file, which starts
+        with the size and modification time of the indexed file. If the
+        file has changed or cannot be read, the index is built and cached
+        again, first to a temporary file which then replaces the index
+        file, so that concurrent readers never see an incomplete index.
+        """
+        stat = os.stat(filename)
+        header = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+        index_file = filename + INDEX_SUFFIX
+        if os.path.exists(index_file):
+            try:
+                index = np.load(index_file, mmap_mode="r")
+                if index.ndim == 1 and len(index) > 2 \
+                        and np.array_equal(index[:2], header):
+                    return index[2:]
+                del index  # release the stale index before replacing it
+            except (OSError, ValueError, EOFError):
+                pass  # e.g. incomplete or corrupt index, build it again
+
+        offsets = NgramsFile.__build_offsets(buffer)
+        tmp_file = None
+        try:  # cache index for next time
+            fd, tmp_file = tempfile.mkstemp(
+                suffix=".tmp", prefix=os.path.basename(filename),
+                dir=os.path.dirname(os.path.abspath(index_file)))
+            with open(fd, "wb") as out_file:
+                np.save(out_file, np.concatenate([header, offsets]))
+            os.replace(tmp_file, index_file)
+        except OSError:  # e.g. read-only location, index is only kept in memory
+            if tmp_file is not None and os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        return offsets
+
+
+def is_compressed(filename: str) -> bool:
+    return filename.lower().endswith(COMPRESSED_SUFFIXES)
+
+
+def iter_raw_lines(filename: str) -> Iterator[bytes]:
+    """
+    Streams the lines of a plain, ZIP or gzip file as they are stored,
+    i.e. without decoding them and with their line terminators.
+    :param filename: the file to be read.
+    """
+    name = filename.lower()
+    if name.endswith(".zip"):
+        with zipfile.ZipFile(filename) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as member:
+                    yield from member
+    elif name.endswith(".gz"):
+        with gzip.open(filename, "rb") as file:
+            yield from file
+    else:
+        with open(filename, "rb") as file:
+            yield from file
+
+
+def iter_lines(filename: str, encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Streams the decoded lines of a plain, ZIP or gzip file.
+    :param filename: the file to be read.
+    :param encoding: encoding of the file (or its members).
+    """
+    for line in iter_raw_lines(filename):
+        yield line.decode(encoding)
+
+
+class NgramsLines:
+
+    def __init__(self, filename: str, encoding: str = "utf-8") -> None:
+        """
+        Reads all lines of a compressed file into memory, as compressed
+        files cannot be mapped. Provides the same access as NgramsFile.
+        :param filename: the file to be read.
+        :param encoding: encoding of the file.
+        """
+        super().__init__()
+        self.__filename = filename
+        self.__encoding = encoding
+        self.__lines = list(iter_raw_lines(filename))
+
+    def __getstate__(self):
+        # other processes read the file again instead of copying all lines
+        return self.__filename, self.__encoding
+
+    def __setstate__(self, state) -> None:
+        self.__init__(*state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.__lines)
+
+    def __getitem__(self, idx: int) -> str:
+        return self.__lines[idx].decode(self.__encoding)
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self.__lines:
+            yield line.decode(self.__encoding)
+
+    def get_filename(self) -> str:
+        return self.__filename
+
+    def get_record(self, idx: int) -> Optional[NgramRecord]:
+        """
+        :return: the parsed line or None if the line is empty.
+        """
+        line = self[idx]
+        return NgramRecord.parse(line) if not line.isspace() else None
+
+    def get_bytes(self, start: int, stop: int) -> bytes:
+        """
+        Returns the lines [start, stop) as they are stored.
+        :param start: number of the first line.
+        :param stop: number of the line after the last line.
+        """
+        if start < 0 or stop > len(self) or start > stop:
+            raise IndexError("line range out of range")
+        return b"".join(self.__lines[start:stop])
+
+    def close(self) -> None:
+        self.__lines = []
+
+
+def open_ngrams(filename: str,
+                encoding: str = "utf-8") -> Union[NgramsFile, NgramsLines]:
+    """
+    Opens a file for access to its lines by number. Plain files are
+    memory-mapped, compressed files are read into memory.
+    """
+    if is_compressed(filename):
+        return NgramsLines(filename, encoding)
+    return NgramsFile(filename, encoding)
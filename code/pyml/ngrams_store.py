@@ -0,0 +1,222 @@
+"""
+author: Matthias Fussenegger
+
+Compact columnar binary format for NGRAMS data sets. A store is a directory
+(with suffix .ngs) which holds one NumPy array per column and a dictionary
+per column of strings:
+
+ - tokens.npy: token ids of the source n-grams, int32 (lines x n)
+ - labels.npy: label ids, uint8 (lines x n)
+ - docids.npy: index into the docid dictionary, int32 (lines)
+ - bbox.npy: bounding boxes, int16 (lines x boxes x 4)
+ - tokens.txt, labels.txt, docids.txt: dictionaries (one entry per line)
+
+All arrays are loaded memory-mapped. Run this module to convert an NGRAMS
+file (plain, .zip or .gz) to a store or a store back to an NGRAMS file,
+depending on the suffix of the target:
+python ngrams_store.py <source> <target>
+"""
+from typing import Dict, Iterator, List, Optional, Union
+import sys
+import os
+import numpy as np
+
+from ngrams_reader import NgramsFile, NgramsLines, NgramRecord, open_ngrams
+
+STORE_SUFFIX = ".ngs"
+UNK_LABEL = "UNKNOWN"
+
+COLUMNS = ("tokens", "labels", "docids", "bbox")
+DICTIONARIES = ("tokens", "labels", "docids")
+
+
+def is_store(path: str) -> bool:
+    return path.rstrip("/\\").endswith(STORE_SUFFIX)
+
+
+# noinspection SpellCheckingInspection
+class NgramsStore:
+
+    def __init__(self, arrays: Dict[str, np.ndarray],
+                 dictionaries: Dict[str, List[str]],
+                 path: str = None) -> None:
+        """
+        Creates a new store, use from_lines or load instead.
+        :param arrays: maps each column name to its array.
+        :param dictionaries: maps each dictionary name to its strings.
+        :param path: directory of the store if loaded, optional.
+        """
+        super().__init__()
+        self.__path = path
+        self.tokens = arrays["tokens"]
+        self.labels = arrays["labels"]
+        self.docids = arrays["docids"]
+        self.bbox = arrays["bbox"]
+        self.token_dict = dictionaries["tokens"]
+        self.label_dict = dictionaries["labels"]
+        self.docid_dict = dictionaries["docids"]
+
+    def __reduce_ex__(self, protocol):
+        if self.__path is not None:  # other processes map the store again
+            return NgramsStore.load, (self.__path,)
+        return super().__reduce_ex__(protocol)
+
+    def __len__(self) -> int:
+        return len(self.docids)
+
+    def __getitem__(self, idx: int) -> str:
+        return self.get_line(idx)
+
+    def __iter__(self) -> Iterator[str]:
+        for idx in range(0, len(self)):
+            yield self.get_line(idx)
+
+    def get_record(self, idx: int) -> Optional[NgramRecord]:
+        boxes = [" ".join(map(str, box)) for box in self.bbox[idx].tolist()]
+        return NgramRecord(
+            src=" ".join([self.token_dict[t] for t in self.tokens[idx]]),
+            labels=[self.label_dict[l] for l in self.labels[idx]],
+            docid=self.docid_dict[self.docids[idx]],
+            bbox="\t".join(boxes) + "\t")
+
+    def get_line(self, idx: int) -> str:
+        """
+        :return: the line as it is stored in an NGRAMS file.
+        """
+        record = self.get_record(idx)
+        return record.src + " \t" + " ".join(record.labels) + "\t" \
+            + record.docid + "\t" + record.bbox + "\n"
+
+    def get_label_id(self, label: str) -> int:
+        """
+        :return: the id of the label or -1 if there is no such label.
+        """
+        return self.label_dict.index(label) \
+            if label in self.label_dict else -1
+
+    def select(self, rows: Union[np.ndarray, List[int]]):
+        """
+        Selects rows by a boolean mask or by their indices.
+        :return: a new store which only holds the selected rows.
+        """
+        return NgramsStore({"tokens": self.tokens[rows],
+                            "labels": self.labels[rows],
+                            "docids": self.docids[rows],
+                            "bbox": self.bbox[rows]},
+                           {"tokens": self.token_dict,
+                            "labels": self.label_dict,
+                            "docids": self.docid_dict})
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for column in COLUMNS:
+            np.save(os.path.join(path, column + ".npy"), getattr(self, column))
+        for name, words in zip(DICTIONARIES, (self.token_dict, self.label_dict,
+                                              self.docid_dict)):
+            with open(os.path.join(path, name + ".txt"), "w",
+                      encoding="utf-8", newline="\n") as out_file:
+                for word in words:
+                    out_file.write(word + "\n")
+
+    @staticmethod
+    def load(path: str):
+        """
+        Loads a store, all arrays are memory-mapped.
+        :param path: directory of the store.
+        :return: an instance of this class.
+        """
+        arrays = {column: np.load(os.path.join(path, column + ".npy"),
+                                  mmap_mode="r") for column in COLUMNS}
+        dictionaries = {}
+        for name in DICTIONARIES:
+            with open(os.path.join(path, name + ".txt"), "r",
+                      encoding="utf-8", newline="\n") as in_file:
+                dictionaries[name] = [word[:-1] for word in in_file]
+        return NgramsStore(arrays, dictionaries, path)
+
+    @staticmethod
+    def from_lines(lines: Union[NgramsFile, NgramsLines]):
+        """
+        Converts all lines of an NGRAMS file. Empty lines are skipped.
+        :param lines: lines of an NGRAMS file.
+        :return: an instance of this class.
+        """
+        ids = {name: {} for name in DICTIONARIES}
+        arrays = None
+        num_rows = 0
+
+        def get_id(name: str, word: str) -> int:
+            word_ids = ids[name]
+            word_id = word_ids.get(word)
+            if word_id is None:
+                word_id = len(word_ids)
+                word_ids[word] = word_id
+            return word_id
+
+        for line in lines:
+            if line.isspace():
+                continue
+            record = NgramRecord.parse(line)
+            tokens = record.src.split(" ")
+            boxes = [[int(v) for v in box.split(" ")]
+                     for box in record.bbox.split("\t") if box]
+            if arrays is None:  # allocate by shape of first record
+                arrays = {
+                    "tokens": np.zeros((len(lines), len(tokens)), np.int32),
+                    "labels": np.zeros((len(lines), len(record.labels)),
+                                       np.uint8),
+                    "docids": np.zeros(len(lines), np.int32),
+                    "bbox": np.zeros((len(lines), len(boxes), 4), np.int16)
+                }
+            try:
+                arrays["tokens"][num_rows] = [get_id("tokens", t) for t in tokens]
+                arrays["labels"][num_rows] = [get_id("labels", l)
+                                              for l in record.labels]
+                arrays["bbox"][num_rows] = boxes
+            except OverflowError:
+                raise ValueError("Bounding box or label id out of range "
+                                 "in line: %s" % line)
+            except ValueError:
+                raise ValueError("Inconsistent n-gram size in line: %s" % line)
+            arrays["docids"][num_rows] = get_id("docids", record.docid)
+            num_rows += 1
+
+        if arrays is None:
+            raise ValueError("No n-grams found.")
+
+        return NgramsStore({column: array[:num_rows]
+                            for column, array in arrays.items()},
+                           {name: list(word_ids.keys())
+                            for name, word_ids in ids.items()})
+
+
+NgramsData = Union[NgramsFile, NgramsLines, NgramsStore]
+
+
+def load_ngrams(path: str) -> NgramsData:
+    """
+    Opens an NGRAMS file (plain or compressed) or store, depending on
+    the specified path. All provide len, the lines by number and get_record.
+    """
+    return NgramsStore.load(path) if is_store(path) else open_ngrams(path)
+
+
+def main():
+    source = sys.argv[1]  # NGRAMS file or store
+    target = sys.argv[2]  # store (if suffix is .ngs) or NGRAMS file
+
+    if is_store(target):
+        with open_ngrams(source) as lines:
+            store = NgramsStore.from_lines(lines)
+        store.save(target)
+        print("Store written to: %s" % target)
+    else:  # convert back to NGRAMS file
+        store = NgramsStore.load(source)
+        with open(target, "w", encoding="utf-8", newline="\r\n") as out_file:
+            for line in store:
+                out_file.write(line)
+        print("NGRAMS file written to: %s" % target)
+
+
+if __name__ == "__main__":
+    main()
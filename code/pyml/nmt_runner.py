@@ -1,11 +1,19 @@
 """
 author: Matthias Fussenegger
 """
-from typing import List, Tuple
+from typing import Dict, List
+import json
 import sys
 import os
 
+import file_compare
+
 COMPARE_ONLY = False  # skips training
+SKIP_UNCHANGED = True  # skips folds which have not changed since training
+
+# manifest of the folds (see normalizer) and key of the trained fold
+MANIFEST_FILE = "folds.json"
+KEY_FILE = "fold.key"
 
 # output directory of NMT model
 OUT_DIR_NAME = "MODEL"
@@ -87,9 +95,38 @@ def get_dirs(path: str) -> List[str]:
     return dirs
 
 
+def get_fold_keys(path: str) -> Dict[str, str]:
+    """
+    :return: the key of each fold according to the manifest written by
+    the normalizer or an empty dictionary if there is no manifest.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), "r",
+                  encoding="utf-8") as in_file:
+            return json.load(in_file).get("folds", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def read_key(filename: str) -> str:
+    try:
+        with open(filename, "r", encoding="utf-8") as in_file:
+            return in_file.read().strip()
+    except OSError:
+        return ""
+
+
 def compare_output(script: str, src: str, tgt: str, out: str) -> bool:
     if os.path.exists(out):
         print("File will be replaced: %s" % out)
+    if os.path.basename(script) == "file_compare.py":
+        # compare in this process instead of launching the script
+        try:
+            file_compare.write_report(out, file_compare.compare_files(src, tgt))
+        except (OSError, ValueError) as e:
+            print("Error comparing files: %s" % str(e))
+            return False
+        return True
     # run file comparison and save output to file
     launch_comm = "python \"" + script + "\" " + \
                   "\"" + src + "\"" + " " + "\"" + tgt + "\"" + \
@@ -106,12 +143,21 @@ def main():
     comp_script = sys.argv[6]  # path to script for file comparison
 
     nmt_runner = NmtRunner(vocab_name, embed_name)
+    fold_keys = get_fold_keys(working_dir) if SKIP_UNCHANGED else {}
 
     for d in get_dirs(working_dir):
         dir_name = d  # is just the name, no path included
         if dir_name.startswith(fold_dir_prefix):
+            fold_key = fold_keys.get(dir_name, "")
             dir_name = os.path.join(working_dir, dir_name)
             print("Detected Fold in: %s" % dir_name)
+            key_file = os.path.join(dir_name, OUT_DIR_NAME, KEY_FILE)
+            if not COMPARE_ONLY and len(fold_key) != 0:
+                if read_key(key_file) == fold_key:
+                    print("Fold unchanged, skipping: %s" % dir_name)
+                    continue
+                if os.path.exists(key_file):  # model is outdated
+                    os.remove(key_file)
             if not nmt_runner.run(nmt_root, dir_name):
                 print("Error running NMT with Fold: %s" % dir_name)
             else:  # success
@@ -119,12 +165,19 @@ def main():
                 src_tst = os.path.join(dir_name, TEST_PREFIX + "." + TGT_SUFFIX)
                 tgt_tst = os.path.join(dir_name, OUT_DIR_NAME, "output_test")
                 out_tst = os.path.join(dir_name, OUT_DIR_NAME, "comp_test.txt")
-                compare_output(comp_script, src_tst, tgt_tst, out_tst)
+                is_tst_ok = compare_output(comp_script, src_tst, tgt_tst, out_tst)
                 # compare dev output and write to file
                 src_dev = os.path.join(dir_name, DEV_PREFIX + "." + TGT_SUFFIX)
                 tgt_dev = os.path.join(dir_name, OUT_DIR_NAME, "output_dev")
                 out_dev = os.path.join(dir_name, OUT_DIR_NAME, "comp_dev.txt")
-                compare_output(comp_script, src_dev, tgt_dev, out_dev)
+                is_dev_ok = compare_output(comp_script, src_dev, tgt_dev, out_dev)
+                if not (is_tst_ok and is_dev_ok):
+                    # no key, so that the fold is run again next time
+                    print("Error comparing output of Fold: %s" % dir_name)
+                elif not COMPARE_ONLY and len(fold_key) != 0:
+                    # remember which fold the model has been trained with
+                    with open(key_file, "w", encoding="utf-8") as out_file:
+                        out_file.write(fold_key + "\n")
 
 
 if __name__ == "__main__":
@@ -1,17 +1,34 @@
 """
 author: Matthias Fussenegger
 """
-from typing import List, Tuple
-from random import seed
-from random import shuffle
-from random import randint
+from typing import Dict, List, Optional, Sequence, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from random import Random
 from math import ceil
+from time import time
+import hashlib
+import heapq
+import json
+import shutil
 import sys
 import os
-import re
+
+import numpy as np
+
+from docid_index import DocidIndex
+from ngrams_reader import NgramRecord, is_compressed
+from ngrams_store import COLUMNS, DICTIONARIES, NgramsData, NgramsStore, \
+    is_store, load_ngrams
 
 IS_SHUFFLE_DATA = True  # true to shuffle data before cross folds
 IS_SHUFFLE_FOLDS = True  # true to shuffle folds before processing them
+MAX_WORKERS = None  # processes for repeated splits (None = all cores)
+IS_BALANCE_DOCS = True  # true to balance lines per fold if split by docs
+IS_CHUNK_STORE = True  # true to store chunks once instead of fold copies
+
+CHUNKS_DIR = "CHUNKS"
+CHUNKS_SUFFIX = ".chunks"  # suffix of manifests (see NMT iterator_utils)
+MANIFEST_FILE = "folds.json"  # written to each repetition (see nmt_runner)
 
 SRC_SUFFIX = ".src"
 TGT_SUFFIX = ".tgt"
@@ -21,91 +38,130 @@ BBX_SUFFIX = ".bbox"
 
 class Fold:
 
-    def __init__(self, train_set: List,
-                 dev_set: List,
-                 test_set: List) -> None:
+    def __init__(self, lines: NgramsData,
+                 chunks: List[List[Sequence[int]]],
+                 train_chunks: List[int],
+                 dev_chunk: Optional[int],
+                 test_chunk: int) -> None:
+        """
+        Creates a new fold over a shared array of lines. The lines
+        are never copied, each chunk is a list of index sequences (e.g.
+        ranges or the indices of a document) into the lines and each
+        set is referenced by the numbers of its chunks.
+        :param lines: all lines of the data set (shared by all folds).
+        :param chunks: all chunks of the data set (shared by all folds).
+        :param train_chunks: chunk numbers of the training set.
+        :param dev_chunk: chunk number of the development set, optional.
+        :param test_chunk: chunk number of the test set.
+        """
         super().__init__()
-        assert len(train_set) != 0
-        assert len(test_set) != 0
-        self.__train_set = None
-        self.__dev_set = None
-        self.__test_set = None
-
-        # process train set
-        if isinstance(train_set[0], Document):
-            self.__train_set = []
-            for doc in train_set:
-                self.__train_set.extend(doc.get_lines())
-        else:
-            self.__train_set = list(train_set)
+        assert len(train_chunks) != 0
+        self.__lines = lines
+        self.__chunks = chunks
+        self.__train_chunks = train_chunks
+        self.__dev_chunks = [dev_chunk] if dev_chunk is not None else []
+        self.__test_chunks = [test_chunk]
 
-        # process test set
-        if isinstance(test_set[0], Document):
-            self.__test_set = []
-            for doc in test_set:
-                self.__test_set.extend(doc.get_lines())
-        else:
-            self.__test_set = list(test_set)
+    def __iter_records(self, chunk_nums: List[int]) -> Iterator[Optional[NgramRecord]]:
+        for chunk_num in chunk_nums:
+            yield from iter_records(self.__lines, self.__chunks[chunk_num])
+
+    def get_train_chunks(self) -> List[int]:
+        return self.__train_chunks
+
+    def get_dev_chunks(self) -> List[int]:
+        return self.__dev_chunks
+
+    def get_test_chunks(self) -> List[int]:
+        return self.__test_chunks
 
-        # process dev set
-        if dev_set is not None \
-                and len(dev_set) != 0:
-            if isinstance(dev_set[0], Document):
-                self.__dev_set = []
-                for doc in dev_set:
-                    self.__dev_set.extend(doc.get_lines())
-            else:
-                self.__dev_set = list(dev_set)
+    def get_train_set(self) -> Iterator[Optional[NgramRecord]]:
+        return self.__iter_records(self.__train_chunks)
 
-    def get_train_set(self) -> List[str]:
-        return list(self.__train_set)
+    def get_dev_set(self) -> Iterator[Optional[NgramRecord]]:
+        return self.__iter_records(self.__dev_chunks)
 
-    def get_dev_set(self) -> List[str]:
-        return list(self.__dev_set)
+    def get_test_set(self) -> Iterator[Optional[NgramRecord]]:
+        return self.__iter_records(self.__test_chunks)
 
-    def get_test_set(self) -> List[str]:
-        return list(self.__test_set)
+    def get_key(self) -> str:
+        """
+        :return: hash of the line numbers of all sets, which identifies
+        the content of this fold for a given input.
+        """
+        digest = hashlib.sha1()
+        for chunk_nums in (self.__train_chunks, self.__test_chunks,
+                           self.__dev_chunks):
+            digest.update(b"|")  # separates the sets
+            for chunk_num in chunk_nums:
+                for indices in self.__chunks[chunk_num]:
+                    digest.update(np.asarray(indices, np.int64).tobytes())
+
+        return digest.hexdigest()
 
 
 # noinspection SpellCheckingInspection
 class Document:
 
-    def __init__(self, ngrams: List[str]) -> None:
+    def __init__(self, lines: NgramsData, indices: Sequence[int]) -> None:
         super().__init__()
-        self.__ngrams = list(ngrams)
+        self.__lines = lines
+        self.__indices = indices
+
+    def __len__(self) -> int:
+        return len(self.__indices)
+
+    def get_indices(self) -> Sequence[int]:
+        return self.__indices
 
     def get_lines(self) -> List[str]:
-        return self.__ngrams
+        return [self.__lines[idx] for idx in self.__indices]
 
     @staticmethod
-    def extract_documents(lines: List[str]) -> List:
-        re_doc = re.compile(r"\w{40}")  # SHA-1 (40 chars)
-
-        docs = []
-        doc_lines = []
-        cur_docid = None
-
-        for line in lines:
-            match = re_doc.search(line)
-            assert match is not None
-            docid = match.group(0)
-            if cur_docid is None:  # is first
-                cur_docid = docid
-                doc_lines.append(line)
-            elif docid == cur_docid:
-                doc_lines.append(line)
-            else:  # new document
-                doc = Document(doc_lines)
-                docs.append(doc)
-                doc_lines.clear()
-                doc_lines.append(line)
-                cur_docid = docid
-
-        # consider last document
-        doc = Document(doc_lines)
-        docs.append(doc)
-
-        return docs
+    def extract_documents(lines: NgramsData) -> List:
+        """
+        Groups the lines by their docid in a single pass. Lines of a
+        document do not have to be adjacent.
+        :param lines: lines of an NGRAMS file.
+        :return: list of documents in order of their first occurrence.
+        """
+        groups: Dict[str, List[int]] = {}
+
+        for idx, line in enumerate(lines):
+            if line.isspace():
+                continue
+            docid = line.split("\t", 3)[2]
+            indices = groups.get(docid)
+            if indices is None:  # new document
+                indices = []
+                groups[docid] = indices
+            indices.append(idx)
+
+        return [Document(lines, indices) for indices in groups.values()]
+
+    @staticmethod
+    def from_index(lines: NgramsData, doc_index: DocidIndex) -> List:
+        """
+        Creates the documents from a docid index of the lines.
+        :param lines: lines of the indexed NGRAMS file.
+        :param doc_index: the index of the NGRAMS file.
+        :return: list of documents in order of their first occurrence.
+        """
+        return [Document(lines, doc_index.get_line_numbers(docid))
+                for docid in doc_index.get_docids()]
+
+    @staticmethod
+    def from_store(store: NgramsStore) -> List:
+        """
+        Creates the documents from the docid column of a store.
+        :param store: the store of which to create the documents.
+        :return: list of documents in order of their first occurrence.
+        """
+        order = np.argsort(store.docids, kind="stable")
+        bounds = np.flatnonzero(np.diff(store.docids[order])) + 1
+        groups = np.split(order, bounds) if len(order) != 0 else []
+        groups.sort(key=lambda group: group[0])
+        return [Document(store, group) for group in groups]
 
 
 class Directory:
@@ -128,164 +184,467 @@ class Directory:
 
 # noinspection SpellCheckingInspection
 class OutputGenerator:
-    __re_src = re.compile(r"\s\t.+")
-    __re_tgt0 = re.compile(r"\t(\w| |_)+\t")
-    __re_doc = re.compile(r"\w{40}")  # SHA-1 (40 chars)
-    __re_bbox = re.compile(r".+\w{40}\t")
+    # translate labels to more meaningful words
+    # labels originated from SAP system (table)
+    __label_table = {
+        "UNKNOWN": "unbekannt",
+        "XBLNR": "rechnungsnummer",
+        "EBELN": "bestellnummer",
+        "REDAT": "rechnungsdatum",
+        "WRBTR": "gesamtbetrag",
+        "WMWST": "steuerbetrag",
+        "VAT_NUMBER": "uid-nummer"
+    }
 
     def __init__(self) -> None:
         super().__init__()
 
-    def __prepare_src_set(self, data: List[str]) -> List[str]:
-        src_set = []
-        for line in data:
-            if line.isspace():
-                continue
-            repl = self.__re_src.sub("", line)
-            src_set.append(repl)
-
-        return src_set
-
-    def __prepare_tgt_set(self, data: List[str]) -> List[str]:
-        tgt_set = []
-        for line in data:
-            if line.isspace():
-                continue
-            repl = self.__re_tgt0.search(line).group(0)
-            repl = repl.replace("\t", "")
-            # translate labels to more meaningful words
-            # labels originated from SAP system (table)
-            repl = repl.replace("UNKNOWN", "unbekannt")
-            repl = repl.replace("XBLNR", "rechnungsnummer")
-            repl = repl.replace("EBELN", "bestellnummer")
-            repl = repl.replace("REDAT", "rechnungsdatum")
-            repl = repl.replace("WRBTR", "gesamtbetrag")
-            repl = repl.replace("WMWST", "steuerbetrag")
-            repl = repl.replace("VAT_NUMBER", "uid-nummer")
-            tgt_set.append(repl + "\n")
-
-        if tgt_set[-1].isspace():
-            del tgt_set[-1]
-
-        return tgt_set
-
-    def __prepare_doc_set(self, data: List[str]) -> List[str]:
-        doc_set = []
-        for line in data:
-            if line.isspace():
-                continue
-            docid = self.__re_doc.search(line).group(0)
-            doc_set.append(docid + "\n")
+    def __translate(self, labels: List[str]) -> str:
+        return " ".join([self.__label_table.get(label, label)
+                         for label in labels])
+
+    def write_set(self, records: Iterator[Optional[NgramRecord]],
+                  prefix: str, digest=None) -> List[str]:
+        """
+        Writes the source, target, docid and bbox file of a single set
+        in one streaming pass over the specified records.
+        :param records: the records of the set (None for empty lines).
+        :param prefix: path and prefix of the files to be written.
+        :param digest: hash object updated with all output, optional.
+        :return: the names of the written files.
+        """
+        filenames = [prefix + suffix for suffix in
+                     (SRC_SUFFIX, TGT_SUFFIX, DOC_SUFFIX, BBX_SUFFIX)]
+        with open(filenames[0], "w", encoding="utf-8") as src_file, \
+                open(filenames[1], "w", encoding="utf-8") as tgt_file, \
+                open(filenames[2], "w", encoding="utf-8") as doc_file, \
+                open(filenames[3], "w", encoding="utf-8") as bbx_file:
+            for record in records:
+                if record is None:
+                    continue
+                tgt = self.__translate(record.labels)
+                src_file.write(record.src + "\n")
+                tgt_file.write(tgt + "\n")
+                doc_file.write(record.docid + "\n")
+                bbx_file.write(record.bbox + "\n")
+                if digest is not None:
+                    digest.update(("\t".join((record.src, tgt, record.docid,
+                                               record.bbox)) + "\n").encode())
+
+        return filenames
+
+    def generate(self, fold: Fold, path: str) -> Iterator[str]:
+        """
+        Writes all sets of the specified fold to the specified path.
+        :param fold: the fold of which to write all sets.
+        :param path: the directory in which the files are written.
+        :return: an iterator over the names of all written files.
+        """
+        yield from self.write_set(fold.get_train_set(),
+                                  os.path.join(path, "train"))
+        yield from self.write_set(fold.get_test_set(),
+                                  os.path.join(path, "test"))
+        yield from self.write_set(fold.get_dev_set(),
+                                  os.path.join(path, "dev"))
 
-        if doc_set[-1].isspace():
-            del doc_set[-1]
 
-        return doc_set
-
-    def __prepare_bbx_set(self, data: List[str]) -> List[str]:
-        bbox_set = []
-        for line in data:
-            if line.isspace():
-                continue
-            bbox = self.__re_bbox.sub("", line)
-            bbox_set.append(bbox)
-
-        return bbox_set
-
-    def generate(self, fold: Fold) -> Tuple[List[str], str]:
-        # process training set
-        src_set = self.__prepare_src_set(fold.get_train_set())
-        tgt_set = self.__prepare_tgt_set(fold.get_train_set())
-        doc_set = self.__prepare_doc_set(fold.get_train_set())
-        bbx_set = self.__prepare_bbx_set(fold.get_train_set())
-        yield src_set, "train" + SRC_SUFFIX
-        yield tgt_set, "train" + TGT_SUFFIX
-        yield doc_set, "train" + DOC_SUFFIX
-        yield bbx_set, "train" + BBX_SUFFIX
-        # process test set
-        src_set = self.__prepare_src_set(fold.get_test_set())
-        tgt_set = self.__prepare_tgt_set(fold.get_test_set())
-        doc_set = self.__prepare_doc_set(fold.get_test_set())
-        bbx_set = self.__prepare_bbx_set(fold.get_test_set())
-        yield src_set, "test" + SRC_SUFFIX
-        yield tgt_set, "test" + TGT_SUFFIX
-        yield doc_set, "test" + DOC_SUFFIX
-        yield bbx_set, "test" + BBX_SUFFIX
-        # process dev set
-        src_set = self.__prepare_src_set(fold.get_dev_set())
-        tgt_set = self.__prepare_tgt_set(fold.get_dev_set())
-        doc_set = self.__prepare_doc_set(fold.get_dev_set())
-        bbx_set = self.__prepare_bbx_set(fold.get_dev_set())
-        yield src_set, "dev" + SRC_SUFFIX
-        yield tgt_set, "dev" + TGT_SUFFIX
-        yield doc_set, "dev" + DOC_SUFFIX
-        yield bbx_set, "dev" + BBX_SUFFIX
+# noinspection SpellCheckingInspection
+class ChunkStore:
+    """
+    Stores each chunk only once, named by the SHA-1 of its content. The
+    folds only hold manifests which list the chunk files of each set,
+    the test and dev set are additionally linked into the fold.
+    """
+
+    def __init__(self, path: str, output_gen: OutputGenerator) -> None:
+        super().__init__()
+        os.makedirs(path, exist_ok=True)
+        self.__path = path
+        self.__output_gen = output_gen
+        self.__tmp_count = 0
+
+    def get_filename(self, chunk_id: str, suffix: str) -> str:
+        return os.path.join(self.__path, chunk_id + suffix)
+
+    def put(self, records: Iterator[Optional[NgramRecord]]) -> str:
+        """
+        Writes the records of a chunk to the store.
+        :param records: the records of the chunk.
+        :return: the identifier (content hash) of the chunk.
+        """
+        self.__tmp_count += 1
+        tmp_prefix = os.path.join(self.__path, "tmp_%d_%d" % (
+            os.getpid(), self.__tmp_count))
+        digest = hashlib.sha1()
+        tmp_files = self.__output_gen.write_set(records, tmp_prefix, digest)
+        chunk_id = digest.hexdigest()
+        for tmp_file in tmp_files:
+            suffix = tmp_file[len(tmp_prefix):]
+            os.replace(tmp_file, self.get_filename(chunk_id, suffix))
+
+        return chunk_id
+
+    def write_manifests(self, path: str, set_name: str,
+                        chunk_ids: List[str]) -> Iterator[str]:
+        """
+        Writes a manifest per suffix, listing the chunk files relative
+        to the specified path, which is usually the fold directory.
+        :param path: the directory in which the manifests are written.
+        :param set_name: the name of the set, e.g. train.
+        :param chunk_ids: identifiers of the chunks of the set.
+        :return: an iterator over the names of all written manifests.
+        """
+        for suffix in (SRC_SUFFIX, TGT_SUFFIX, DOC_SUFFIX, BBX_SUFFIX):
+            filename = os.path.join(path, set_name + suffix + CHUNKS_SUFFIX)
+            with open(filename, "w", encoding="utf-8") as out_file:
+                for chunk_id in chunk_ids:
+                    chunk_file = os.path.relpath(
+                        self.get_filename(chunk_id, suffix), path)
+                    out_file.write(chunk_file.replace(os.sep, "/") + "\n")
+            yield filename
+
+    def link(self, path: str, set_name: str, chunk_id: str) -> Iterator[str]:
+        """
+        Hard-links the files of a single chunk as set into the path.
+        Falls back to copying if hard links are not supported.
+        """
+        for suffix in (SRC_SUFFIX, TGT_SUFFIX, DOC_SUFFIX, BBX_SUFFIX):
+            filename = os.path.join(path, set_name + suffix)
+            if os.path.exists(filename):
+                os.remove(filename)
+            try:
+                os.link(self.get_filename(chunk_id, suffix), filename)
+            except OSError:
+                shutil.copyfile(self.get_filename(chunk_id, suffix), filename)
+            yield filename
+
+    def collect_garbage(self, root: str) -> Iterator[str]:
+        """
+        Removes all files of the store which are not listed in any manifest
+        below the root directory, e.g. chunks of folds that have changed.
+        Must not be called while folds are written to the store.
+        :param root: directory which contains all folds using the store.
+        :return: an iterator over the names of all removed files.
+        """
+        referenced = set()
+        for dir_path, _, filenames in os.walk(root):
+            for name in filenames:
+                if not name.endswith(CHUNKS_SUFFIX):
+                    continue
+                manifest = os.path.join(dir_path, name)
+                with open(manifest, "r", encoding="utf-8") as in_file:
+                    for chunk_file in in_file.read().splitlines():
+                        referenced.add(os.path.normcase(os.path.abspath(
+                            os.path.join(dir_path, chunk_file))))
+
+        for name in os.listdir(self.__path):
+            filename = os.path.join(self.__path, name)
+            if os.path.isfile(filename) and os.path.normcase(
+                    os.path.abspath(filename)) not in referenced:
+                os.remove(filename)  # linked sets keep their own link
+                yield filename
 
 
 # noinspection SpellCheckingInspection
 class FoldUtils:
     @staticmethod
-    def __chunks_gen(dataset: List, steps: int) -> List:
-        for i in range(0, len(dataset), steps):
-            yield dataset[i:i + steps]
+    def __chunks_gen(size: int, steps: int) -> Iterator[range]:
+        for i in range(0, size, steps):
+            yield range(i, min(i + steps, size))
+
+    @staticmethod
+    def __balanced_chunks(docs: List[Document], num_chunks: int,
+                          rnd: Random) -> List[List[Sequence[int]]]:
+        """
+        Distributes the documents greedily over the chunks, so that each
+        chunk holds about the same number of lines. Largest documents are
+        assigned first, each to the chunk with the least lines so far.
+        Chunks are visited in random order and ties (documents of equal
+        size, chunks with equally many lines) are broken randomly, so that
+        repetitions with different seeds get different chunks.
+        """
+        chunks = [[] for _ in range(0, num_chunks)]
+        chunk_nums = list(range(0, num_chunks))
+        rnd.shuffle(chunk_nums)
+        # (lines, random tie-break, chunk)
+        heap = [(0, rnd.random(), i) for i in chunk_nums]
+        heapq.heapify(heap)
+        for doc in sorted(docs, key=lambda d: (-len(d), rnd.random())):
+            num_lines, _, chunk_num = heapq.heappop(heap)
+            chunks[chunk_num].append(doc.get_indices())
+            heapq.heappush(heap, (num_lines + len(doc), rnd.random(), chunk_num))
+
+        return chunks
 
     @staticmethod
-    def kfold_split(dataset: List, num_folds: int,
-                    is_shuffle: bool = False) -> List[Fold]:
+    def make_chunks(lines: NgramsData, num_folds: int,
+                    docs: List[Document] = None,
+                    order: Sequence[int] = None,
+                    rnd: Random = None) -> List[List[Sequence[int]]]:
+        """
+        Cuts the data set into chunks. Each chunk is represented as a list
+        of index sequences into the lines, so no line is ever copied.
+        :param lines: all lines of the data set.
+        :param num_folds: the number of chunks to be created.
+        :param docs: documents to split by (instead of lines), optional.
+        :param order: order of lines if not split by documents, optional.
+        :param rnd: random generator to balance documents with, optional.
+        :return: list of chunks.
+        """
+        chunks = []  # to be returned
+
+        if rnd is None:
+            rnd = Random()  # seed is current time
+
+        if docs is not None and IS_BALANCE_DOCS:  # balance by lines
+            for chunk in FoldUtils.__balanced_chunks(docs, num_folds, rnd):
+                print("Length of chunk: %s" % str(sum(len(c) for c in chunk)))
+                chunks.append(chunk)
+        elif docs is not None:  # split by number of documents
+            fold_size = ceil(len(docs) / num_folds)
+            for chunk_range in FoldUtils. \
+                    __chunks_gen(len(docs), fold_size):
+                chunk = [docs[i].get_indices() for i in chunk_range]
+                print("Length of chunk: %s" % str(sum(len(c) for c in chunk)))
+                chunks.append(chunk)
+        else:  # split lines directly
+            if order is None:
+                order = range(0, len(lines))
+            fold_size = ceil(len(order) / num_folds)
+            for chunk_range in FoldUtils. \
+                    __chunks_gen(len(order), fold_size):
+                print("Length of chunk: %s" % str(len(chunk_range)))
+                chunks.append([order[chunk_range.start:chunk_range.stop]])
+
+        return chunks
 
-        assert num_folds > 2
+    @staticmethod
+    def kfold_split(lines: NgramsData,
+                    chunks: List[List[Sequence[int]]],
+                    is_shuffle: bool = False,
+                    rnd: Random = None) -> List[Fold]:
+        """
+        Builds one fold per chunk, which is used as test set.
+        :param lines: all lines of the data set.
+        :param chunks: the chunks as returned by make_chunks.
+        :param is_shuffle: true to shuffle the chunks (in-place).
+        :param rnd: random generator to be used, optional.
+        :return: list of folds, each referencing the lines and chunks.
+        """
+        assert len(chunks) > 2
 
-        chunks = []
         folds = []  # to be returned
 
-        fold_size = ceil(len(dataset) / num_folds)
-        for chunk in FoldUtils. \
-                __chunks_gen(dataset, fold_size):
-            print("Length of chunk: %s" % str(len(chunk)))
-            chunks.append(chunk)
+        if rnd is None:
+            rnd = Random()  # seed is current time
 
         if is_shuffle:
-            seed()  # seed is current time
-            shuffle(chunks)
+            rnd.shuffle(chunks)
 
         for tst_idx in range(0, len(chunks)):
-            tst = chunks[tst_idx]  # select as test set
-            dev_idx = randint(0, len(chunks) - 1)
+            dev_idx = rnd.randint(0, len(chunks) - 1)
             while dev_idx == tst_idx:
                 # randomly select dev set
-                dev_idx = randint(0, len(chunks) - 1)
-            dev = chunks[dev_idx]  # select as dev set
-            train = []  # allocate new memory
+                dev_idx = rnd.randint(0, len(chunks) - 1)
             # build train set from remaining splits
-            for i in range(0, len(chunks)):
-                if i != tst_idx and i != dev_idx:
-                    train.extend(chunks[i])
+            train = [i for i in range(0, len(chunks))
+                     if i != tst_idx and i != dev_idx]
 
-            fold = Fold(train_set=train,
-                        dev_set=dev,
-                        test_set=tst)
+            fold = Fold(lines, chunks,
+                        train_chunks=train,
+                        dev_chunk=dev_idx,
+                        test_chunk=tst_idx)
             folds.append(fold)
 
         return folds
 
 
-def read_file(filename: str, encoding: str = "utf-8") -> List[str]:
-    with open(filename, "r", encoding=encoding) as file:
-        lines = file.readlines()
-
-    return lines
-
-
-def write_file(filename: str, lines: List[str]) -> None:
-    with open(filename, "w", encoding="utf-8") as out_file:
-        for line in lines:
-            out_file.write(line)
+# data shared with worker processes, set once per process
+shared_lines: NgramsData = []
+shared_docs: List[Document] = []
+
+
+def iter_records(lines: NgramsData,
+                 chunk: List[Sequence[int]]) -> Iterator[Optional[NgramRecord]]:
+    for indices in chunk:
+        for idx in indices:
+            yield lines.get_record(idx)
+
+
+def get_input_hash(path: str) -> str:
+    """
+    :return: SHA-1 of the content of an NGRAMS file or store.
+    """
+    digest = hashlib.sha1()
+    if is_store(path):
+        filenames = [os.path.join(path, name + ".npy") for name in COLUMNS] \
+                    + [os.path.join(path, name + ".txt") for name in DICTIONARIES]
+    else:
+        filenames = [path]
+    for filename in filenames:
+        with open(filename, "rb") as in_file:
+            for block in iter(lambda: in_file.read(1 << 20), b""):
+                digest.update(block)
+
+    return digest.hexdigest()
+
+
+def load_manifest(path: str) -> Optional[Dict]:
+    """
+    :return: the fold manifest in the specified directory, if any.
+    """
+    filename = os.path.join(path, MANIFEST_FILE)
+    try:
+        with open(filename, "r", encoding="utf-8") as in_file:
+            return json.load(in_file)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(path: str, manifest: Dict) -> str:
+    filename = os.path.join(path, MANIFEST_FILE)
+    tmp_file = filename + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as out_file:
+        json.dump(manifest, out_file, indent=2)
+    os.replace(tmp_file, filename)  # never leave a partial manifest
+
+    return filename
+
+
+def is_fold_intact(path: str) -> bool:
+    """
+    :return: true if all sets of the fold in the specified directory
+    exist, including all chunk files listed in its manifests.
+    """
+    for set_name in ("train", "test", "dev"):
+        for suffix in (SRC_SUFFIX, TGT_SUFFIX, DOC_SUFFIX, BBX_SUFFIX):
+            filename = os.path.join(path, set_name + suffix)
+            if os.path.exists(filename + CHUNKS_SUFFIX):
+                with open(filename + CHUNKS_SUFFIX, "r", encoding="utf-8") as f:
+                    for chunk_file in f.read().splitlines():
+                        if not os.path.exists(os.path.join(path, chunk_file)):
+                            return False
+                if set_name == "train":  # only test and dev set are linked
+                    continue
+            if not os.path.exists(filename):
+                return False
+
+    return True
+
+
+def check_shuffle(data: List, rnd: Random) -> None:
+    if IS_SHUFFLE_DATA:
+        rnd.shuffle(data)  # in-place
+
+
+def init_shared(lines: NgramsData, docs: List[Document]) -> None:
+    global shared_lines, shared_docs
+    shared_lines = lines
+    shared_docs = docs
+
+
+def generate_folds(target_dir: str, num_folds: int, split_by_doc: bool,
+                   rnd_seed: int, chunk_dir: str = None,
+                   header: Dict = None) -> str:
+    """
+    Shuffles the shared data with its own seed and writes all folds
+    of a single repetition to the target directory.
+    :param target_dir: directory in which the folds are created.
+    :param num_folds: the number of folds to be created.
+    :param split_by_doc: true to split by documents instead of lines.
+    :param rnd_seed: seed for shuffling data and folds.
+    :param chunk_dir: directory of the chunk store, optional. If not
+    specified, each fold holds full copies of all its sets.
+    :param header: input hash and parameters of this run, optional. If
+    specified, a manifest is written and folds which have not changed
+    since the last run (according to its manifest) are not written again.
+    :return: the target directory.
+    """
+    assert num_folds > 2
+    rnd = Random(rnd_seed)
+    directory = Directory(target_dir)
 
+    if split_by_doc:
+        docs = list(shared_docs)  # only copy references
+        check_shuffle(docs, rnd)  # happens in-place
+        chunks = FoldUtils.make_chunks(shared_lines, num_folds, docs, rnd=rnd)
+    else:  # split lines directly
+        order = np.arange(0, len(shared_lines))
+        check_shuffle(order, rnd)  # happens in-place
+        chunks = FoldUtils.make_chunks(shared_lines, num_folds, order=order)
+
+    folds = FoldUtils.kfold_split(
+        shared_lines, chunks, IS_SHUFFLE_FOLDS, rnd)
+    fold_dirs = ["FOLD" + str(num) for num in range(1, len(folds) + 1)]
+    fold_keys = [fold.get_key() for fold in folds]
+
+    # keys of the folds written by the last run with the same input
+    last_keys = {}
+    if header is not None:
+        manifest = load_manifest(target_dir)
+        if manifest is not None and manifest.get("input") == header["input"] \
+                and manifest.get("params") == header["params"]:
+            last_keys = manifest["folds"]
+
+    changed = []
+    for fold, fold_dir, fold_key in zip(folds, fold_dirs, fold_keys):
+        path = os.path.join(target_dir, fold_dir)
+        if last_keys.get(fold_dir) == fold_key and is_fold_intact(path):
+            print("Fold unchanged: %s" % path)
+        else:
+            changed.append((fold, fold_dir))
+
+    if header is not None and len(changed) != 0:
+        # forget changed folds first, in case writing them fails
+        changed_dirs = {fold_dir for _, fold_dir in changed}
+        manifest = dict(header)
+        manifest["seed"] = rnd_seed
+        manifest["folds"] = {fold_dir: fold_key for fold_dir, fold_key
+                             in zip(fold_dirs, fold_keys)
+                             if fold_dir not in changed_dirs}
+        save_manifest(target_dir, manifest)
 
-def check_shuffle(data: List[str]) -> None:
-    if IS_SHUFFLE_DATA:
-        seed()  # seed is time
-        shuffle(data)  # in-place
+    output_gen = OutputGenerator()
+    chunk_store = None
+    chunk_ids = {}
+
+    if chunk_dir is not None:  # write each chunk only once
+        chunk_store = ChunkStore(chunk_dir, output_gen)
+        chunk_nums = sorted({num for fold, _ in changed
+                             for num in fold.get_train_chunks()
+                             + fold.get_test_chunks() + fold.get_dev_chunks()})
+        for num in chunk_nums:  # only chunks of changed folds
+            chunk_id = chunk_store.put(iter_records(shared_lines, chunks[num]))
+            print("Chunk written: %s" % chunk_id)
+            chunk_ids[num] = chunk_id
+
+    for fold, fold_dir in changed:
+        # create folder for each fold
+        path = directory.mkdir(fold_dir)
+        print("Fold directory created: %s" % path)
+        if chunk_store is None:
+            # stream folded sets directly to directory
+            for filename in output_gen.generate(fold, path):
+                print("Set written to: %s" % filename)
+            continue
+        # reference the stored chunks of each set
+        for set_name, chunk_nums in (("train", fold.get_train_chunks()),
+                                     ("test", fold.get_test_chunks()),
+                                     ("dev", fold.get_dev_chunks())):
+            set_ids = [chunk_ids[num] for num in chunk_nums]
+            for filename in chunk_store.write_manifests(path, set_name, set_ids):
+                print("Manifest written to: %s" % filename)
+            if set_name != "train":  # single chunk, link for evaluation
+                for filename in chunk_store.link(path, set_name, set_ids[0]):
+                    print("Set linked to: %s" % filename)
+
+    if header is not None:  # record what has been written
+        manifest = dict(header)
+        manifest["seed"] = rnd_seed
+        manifest["folds"] = dict(zip(fold_dirs, fold_keys))
+        print("Manifest written to: %s" % save_manifest(target_dir, manifest))
+
+    return target_dir
 
 
 # noinspection SpellCheckingInspection
@@ -295,34 +654,67 @@ def main():
     num_folds = int(sys.argv[3])
     split_by_doc = sys.argv[4].lower()
     split_by_doc = True if split_by_doc == "true" else False
-
-    directory = Directory(target_dir)
-    lines = read_file(ngrams_file)
-
-    if bool(split_by_doc):
+    # number of repeated k-fold splits (optional)
+    repeats = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+    # identifies the input and all parameters which affect the output
+    header = {"input": get_input_hash(ngrams_file),
+              "params": {"num_folds": num_folds,
+                         "split_by_doc": split_by_doc,
+                         "shuffle_data": IS_SHUFFLE_DATA,
+                         "shuffle_folds": IS_SHUFFLE_FOLDS,
+                         "balance_docs": IS_BALANCE_DOCS,
+                         "chunk_store": IS_CHUNK_STORE}}
+    rep_dirs = [target_dir]  # folds of a single repetition are not nested
+    if repeats > 1:
+        rep_dirs = [os.path.join(target_dir, "FOLDS_k%d_%d" % (num_folds, rep))
+                    for rep in range(1, repeats + 1)]
+
+    # base seed, each repetition adds its number (optional)
+    if len(sys.argv) > 6:
+        base_seed = int(sys.argv[6])
+    else:  # reuse seed of last run with same input, so nothing changes
+        manifest = load_manifest(rep_dirs[0])
+        if manifest is not None and manifest.get("input") == header["input"] \
+                and manifest.get("params") == header["params"]:
+            base_seed = manifest["base_seed"]
+        else:
+            base_seed = int(time())
+    header["base_seed"] = base_seed
+    print("Base seed: %s" % str(base_seed))
+
+    # read and parse input only once for all repetitions
+    lines = load_ngrams(ngrams_file)  # memory-mapped file, store or archive
+    docs = []
+    if split_by_doc and isinstance(lines, NgramsStore):
+        docs = Document.from_store(lines)
+    elif split_by_doc and is_compressed(ngrams_file):  # no index next to it
         docs = Document.extract_documents(lines)
-        check_shuffle(docs)  # happens in-place
-        folds = FoldUtils.kfold_split(
-            docs, num_folds, IS_SHUFFLE_FOLDS)
-    else:  # split lines directly
-        check_shuffle(lines)  # happens in-place
-        folds = FoldUtils.kfold_split(
-            lines, num_folds, IS_SHUFFLE_FOLDS)
-
-    fold_suffix = 0
-    output_gen = OutputGenerator()
-
-    for fold in folds:
-        fold_suffix += 1
-        # create folder for each fold
-        fold_dir = "FOLD" + str(fold_suffix)
-        path = directory.mkdir(fold_dir)
-        print("Fold directory created: %s" % path)
-        # prepare folded sets and write to directory
-        for out_set, name in output_gen.generate(fold):
-            filename = os.path.join(path, name)
-            write_file(filename, out_set)
-            print("Set written to: %s" % filename)
+    elif split_by_doc:  # index is cached next to the NGRAMS file
+        docs = Document.from_index(lines, DocidIndex.load(ngrams_file))
+    init_shared(lines, docs)
+
+    # chunk store is shared by all repetitions
+    chunk_dir = os.path.join(target_dir, CHUNKS_DIR) if IS_CHUNK_STORE else None
+
+    if repeats == 1:  # write folds directly to target directory
+        generate_folds(target_dir, num_folds, split_by_doc,
+                       base_seed, chunk_dir, header)
+    else:
+        jobs = []
+        with ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                                 initializer=init_shared,
+                                 initargs=(lines, docs)) as executor:
+            for rep, rep_dir in enumerate(rep_dirs, start=1):
+                jobs.append(executor.submit(generate_folds, rep_dir, num_folds,
+                                            split_by_doc, base_seed + rep,
+                                            chunk_dir, header))
+            for job in as_completed(jobs):
+                print("Repetition written to: %s" % job.result())
+
+    if chunk_dir is not None:  # all repetitions are written at this point
+        chunk_store = ChunkStore(chunk_dir, OutputGenerator())
+        for filename in chunk_store.collect_garbage(target_dir):
+            print("Unreferenced chunk removed: %s" % filename)
 
 
 if __name__ == "__main__":
@@ -1,35 +1,46 @@
 """
 author: Matthias Fussenegger
 """
+from typing import Union
 import sys
 from random import shuffle
 
+from ngrams_reader import NgramsFile, NgramsLines, open_ngrams
+
 IS_SHUFFLE = False
 
 
+def write_lines(filename: str, lines: Union[NgramsFile, NgramsLines],
+                order) -> None:
+    with open(filename, "wb") as file:
+        if IS_SHUFFLE:  # write line by line in shuffled order
+            for idx in order:
+                line = lines.get_bytes(idx, idx + 1)
+                file.write(line)
+                if line[-1:] != b"\n":
+                    file.write(b"\n")
+        elif len(order) != 0:  # write whole range without copy
+            data = lines.get_bytes(order[0], order[-1] + 1)
+            file.write(data)
+            if data[-1:] != b"\n":
+                file.write(b"\n")
+
+
 def main():
     split = sys.argv[1]
     fname = sys.argv[2]
     tname = sys.argv[3]
-    with open(fname, "r", encoding="utf-8") as file:
-        lines = file.readlines()
+    lines = open_ngrams(fname)  # memory-mapped or read from archive
+    order = list(range(0, len(lines))) if IS_SHUFFLE else range(0, len(lines))
     if IS_SHUFFLE:
-        shuffle(lines)
+        shuffle(order)
     r1 = int(len(lines) * (int(split) / 100))
     r2 = int(len(lines) * ((100 - int(split)) / 100))
-    s1 = lines[:r1]
-    s2 = lines[r1 + 1:]
-
-    with open(tname + str(r1 + 1), "w", encoding="utf-8") as file:
-        for line in s1:
-            if line[-1] != "\n":
-                line = line + "\n"
-            file.write(line)
-    with open(tname + str(r2), "w", encoding="utf-8") as file:
-        for line in s2:
-            if line[-1] != "\n":
-                line = line + "\n"
-            file.write(line)
+    s1 = order[:r1]
+    s2 = order[r1 + 1:]
+
+    write_lines(tname + str(r1 + 1), lines, s1)
+    write_lines(tname + str(r2), lines, s2)
 
 
 if __name__ == "__main__":
@@ -2,9 +2,14 @@
 author: Matthias Fussenegger
 """
 from typing import List, Dict, Tuple
+from concurrent.futures import ProcessPoolExecutor
 import sys
 import os
 
+import numpy as np
+
+import zip_paths
+
 # noinspection SpellCheckingInspection
 """
 Examples:
@@ -18,30 +23,9 @@ rechnungsnummer unbekannt rechnungsdatum / unbekannt unbekannt rechnungsdatum
 UNK_LABEL = "unbekannt"
 LABELS = [UNK_LABEL, "rechnungsnummer", "rechnungsdatum",
           "gesamtbetrag", "steuerbetrag", "uid-nummer"]
+LABEL_IDS = {label: i for i, label in enumerate(LABELS)}
 
-
-class Counting:
-
-    def __init__(self) -> None:
-        super().__init__()
-        self.__map = {}
-        for label in LABELS:
-            self.__map[label] = 0
-
-    def count(self, label: str) -> int:
-        count = self.__map[label] + 1
-        self.__map[label] = count
-        return count
-
-    def get_values(self) -> Dict[str, int]:
-        return self.__map.copy()
-
-    def to_list(self, sep: str = "\t") -> List[str]:
-        lines = []  # to be returned
-        for key, value in self.__map.items():
-            line = key + sep + str(value) + "\n"
-            lines.append(line)
-        return lines
+MAX_WORKERS = None  # processes for processing files (None = all cores)
 
 
 # noinspection SpellCheckingInspection
@@ -49,72 +33,81 @@ class LinesProcessor:
 
     def __init__(self) -> None:
         super().__init__()
-        self.__actuals = Counting()
-        self.__predict = Counting()
-        self.__predict_part = Counting()  # partially predicted
-        self.__misclassified: Dict[str, Counting] = {}  # falsely predicted as
-        for label in LABELS:
-            self.__misclassified[label] = Counting()
+        # counts of (actual, predicted) label ids of all compared tokens,
+        # the diagonal holds partially correct predictions
+        self.__confusion = np.zeros((len(LABELS), len(LABELS)), np.int64)
+
+    @staticmethod
+    def __parse(ngrams: str) -> Tuple[List[int], List[int]]:
+        split = ngrams.split(" ")  # split at space
+        ng_size = split.index("/")
+        assert len(split) == (ng_size * 2) + 1
+        try:
+            return [LABEL_IDS[label] for label in split[:ng_size]], \
+                   [LABEL_IDS[label] for label in split[ng_size + 1:]]
+        except KeyError as e:
+            raise ValueError("Unknown label: %s" % str(e))
 
     def process(self, lines: List[str]):
+        parsed: Dict[str, Tuple[List[int], List[int]]] = {}
+        act_ids = []
+        prd_ids = []
         for line in lines:
             if line.isspace():
                 continue
             ngrams = line[line.index("\t"):]
-            ngrams = ngrams.replace("\t", "")
-            split = ngrams.split(" ")  # split at space
-            ng_size = split.index("/")
-            assert len(split) == (ng_size * 2) + 1
-            for i in range(0, ng_size):
-                ii = i + ng_size + 1
-                f1 = split[i]
-                f2 = split[ii]
-                if ii == len(split) - 1:
-                    f2 = f2.replace("\n", "").replace("\r", "")
-                if f1 == f2:  # partially correct
-                    self.__predict_part.count(f1)
-                else:  # misclassified
-                    self.__actuals.count(f1)
-                    self.__predict.count(f2)
-                    self.__misclassified[f1].count(f2)
+            ngrams = ngrams.replace("\t", "").rstrip("\r\n")
+            ids = parsed.get(ngrams)
+            if ids is None:  # lines repeat a lot, parse each only once
+                ids = LinesProcessor.__parse(ngrams)
+                parsed[ngrams] = ids
+            act_ids.extend(ids[0])
+            prd_ids.extend(ids[1])
+        # count all pairs of labels at once
+        pairs = np.array(act_ids, np.int64) * len(LABELS) \
+            + np.array(prd_ids, np.int64)
+        self.__confusion += np.bincount(
+            pairs, minlength=len(LABELS) ** 2).reshape(self.__confusion.shape)
+
+    def add(self, confusion: np.ndarray) -> None:
+        """
+        Adds the counts of another processor, e.g. of another process.
+        """
+        self.__confusion += confusion
+
+    def get_confusion(self) -> np.ndarray:
+        return self.__confusion
 
     def get_result(self) -> List[str]:
-        lines = self.__actuals.to_list()
-        lines.insert(0, "!actuals\n")
+        partially = np.diag(self.__confusion)
+        misclassified = self.__confusion - np.diag(partially)
+        actuals = misclassified.sum(axis=1)
+        predict = misclassified.sum(axis=0)
+
+        lines = ["!actuals\n"]
+        lines.extend(to_list(actuals))
         lines.append("\n!predicted\n")
-        lines.extend(self.__predict.to_list())
+        lines.extend(to_list(predict))
         lines.append("\n!partially\n")
-        lines.extend(self.__predict_part.to_list())
+        lines.extend(to_list(partially))
         lines.append("\n!misclassified\n")
 
-        header = "\t"
-        row = "{0}\t"
-        idx_map: Dict[str, int] = {}
-        # build header and row template (misclassified table)
-        for i, label in enumerate(LABELS):
-            header += label + "\t"
-            idx_map[label] = i
-            row += "{" + str(i + 1) + "}\t"
-
-        lines.append(header + "\n")
-
-        for label, counting in self.__misclassified.items():
-            row_temp = str(row)  # copy
-            repl = row_temp.replace("{0}", label)
-            for col_label, count in counting.get_values().items():
-                idx = idx_map[col_label] + 1  # one-based
-                repl = repl.replace("{" + str(idx) + "}", str(count))
-            # once done, append copied row
-            lines.append(repl + "\n")
+        # header and rows of misclassified table (actual x predicted)
+        lines.append("\t" + "".join([label + "\t" for label in LABELS]) + "\n")
+        for label, counts in zip(LABELS, misclassified.tolist()):
+            lines.append(label + "\t"
+                         + "".join([str(c) + "\t" for c in counts]) + "\n")
 
         return lines
 
 
-def read_file(filename: str, encoding: str = "utf-8") -> List[str]:
-    with open(filename, "r", encoding=encoding) as file:
-        lines = file.readlines()
+def to_list(counts: np.ndarray, sep: str = "\t") -> List[str]:
+    return [label + sep + str(count) + "\n"
+            for label, count in zip(LABELS, counts.tolist())]
 
-    return lines
+
+def read_file(filename: str, encoding: str = "utf-8") -> List[str]:
+    return zip_paths.read_lines(filename, encoding)  # file or archive member
 
 
 def write_file(filename: str, lines: List[str]) -> None:
@@ -124,9 +117,15 @@ def write_file(filename: str, lines: List[str]) -> None:
 
 
 def get_files(path: str, prefix: str, postfix: str) -> List[Tuple[str, str]]:
-    return [(path, file) for file in os.listdir(path)
-            if os.path.isfile(os.path.join(path, file))
-            and file.startswith(prefix) and file.endswith(postfix)]
+    # path may also lead into an archive, e.g. A1.zip/A1/NG3
+    return [(path, file) for file, is_dir in zip_paths.list_dir(path)
+            if not is_dir and file.startswith(prefix) and file.endswith(postfix)]
+
+
+def process_file(filename: str) -> np.ndarray:
+    lines_proc = LinesProcessor()
+    lines_proc.process(read_file(filename))
+    return lines_proc.get_confusion()
 
 
 def store_away_result(filename: str, lines_proc: LinesProcessor) -> None:
@@ -143,9 +142,11 @@ def main():
     lines_proc = LinesProcessor()
 
     files = get_files(src_dir, src_prefix, src_postfix)
-    for path, filename in files:
-        lines = read_file(os.path.join(path, filename))
-        lines_proc.process(lines)
+    filenames = [os.path.join(path, filename) for path, filename in files]
+    # process files concurrently and merge their counts
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for confusion in executor.map(process_file, filenames):
+            lines_proc.add(confusion)
 
     store_away_result(tgt_name, lines_proc)
 
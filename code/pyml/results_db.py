@@ -0,0 +1,159 @@
+"""
+author: Matthias Fussenegger
+
+SQLite store of the results of all batches and variants, which is filled
+by stat_collector. Results can be queried with plain SQL, e.g.:
+python results_db.py results.db "SELECT variant, AVG(acc_total) FROM
+results WHERE split = 'test' GROUP BY variant"
+
+Results of a fold are identified by batch, variant, split, repetition (the
+directory of the folds of a repeated split, relative to the folds of the
+variant) and fold number.
+"""
+from typing import Dict, List, Optional, Tuple
+import sqlite3
+import sys
+
+# columns of a single result (one comparison file of a fold)
+RESULT_COLUMNS = (("total_tokens", "INTEGER"), ("diff_tokens", "INTEGER"),
+                  ("acc_total", "REAL"), ("acc_excl_unk", "REAL"),
+                  ("matches_excl_unk", "INTEGER"),
+                  ("matches_incl_unk", "INTEGER"), ("f1_score", "REAL"))
+# columns of the measures over all folds of a variant
+MEASURE_COLUMNS = (("num_folds", "INTEGER"),
+                   ("acc_avg_total", "REAL"), ("acc_avg_excl_unk", "REAL"),
+                   ("stdev_total", "REAL"), ("stdev_excl_unk", "REAL"),
+                   ("var_total", "REAL"), ("var_excl_unk", "REAL"),
+                   ("conf_total_lower", "REAL"), ("conf_total_upper", "REAL"),
+                   ("conf_excl_unk_lower", "REAL"),
+                   ("conf_excl_unk_upper", "REAL"),
+                   ("boot_total_lower", "REAL"), ("boot_total_upper", "REAL"),
+                   ("boot_excl_unk_lower", "REAL"),
+                   ("boot_excl_unk_upper", "REAL"))
+
+SCHEMA_VERSION = 2  # stored as user_version, stores of other versions are rejected
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    batch TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    ngram_size INTEGER,
+    split TEXT NOT NULL,
+    repetition TEXT NOT NULL,
+    fold INTEGER,
+    filename TEXT NOT NULL,
+    {0},
+    UNIQUE (batch, variant, split, repetition, fold)
+);
+CREATE INDEX IF NOT EXISTS results_idx
+    ON results (batch, ngram_size, repetition, fold, split);
+CREATE TABLE IF NOT EXISTS measures (
+    batch TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    ngram_size INTEGER,
+    split TEXT NOT NULL,
+    {1},
+    UNIQUE (batch, variant, split)
+);
+CREATE INDEX IF NOT EXISTS measures_idx
+    ON measures (batch, ngram_size, split);
+""".format(",\n    ".join(name + " " + kind for name, kind in RESULT_COLUMNS),
+           ",\n    ".join(name + " " + kind for name, kind in MEASURE_COLUMNS))
+
+
+class ResultsDb:
+
+    def __init__(self, filename: str) -> None:
+        """
+        Opens the store and creates its tables if they do not exist.
+        :param filename: the database file.
+        """
+        super().__init__()
+        self.__conn = sqlite3.connect(filename)
+        version = self.__conn.execute("PRAGMA user_version").fetchone()[0]
+        has_tables = self.__conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        if has_tables and version != SCHEMA_VERSION:
+            self.__conn.close()
+            raise ValueError("Results store %s has schema version %d instead "
+                             "of %d." % (filename, version, SCHEMA_VERSION))
+        self.__conn.executescript(SCHEMA)
+        self.__conn.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.__conn.commit()
+        self.close()
+
+    @staticmethod
+    def __insert(table: str, keys: Dict, columns: Tuple,
+                 values: Dict) -> Tuple[str, List]:
+        names = list(keys.keys()) + [name for name, _ in columns]
+        sql = "INSERT OR REPLACE INTO %s (%s) VALUES (%s)" % (
+            table, ", ".join(names), ", ".join(["?"] * len(names)))
+        return sql, list(keys.values()) + [values.get(name)
+                                           for name, _ in columns]
+
+    def add_result(self, batch: str, variant: str, split: str,
+                   ngram_size: str, repetition: str, fold: str,
+                   filename: str, values: Dict) -> None:
+        """
+        Adds the result of a fold, replacing an existing one of the
+        same batch, variant, split, repetition and fold.
+        :param values: maps the names of RESULT_COLUMNS to their values.
+        """
+        self.__conn.execute(*ResultsDb.__insert(
+            "results", {"batch": batch, "variant": variant,
+                        "ngram_size": ngram_size, "split": split,
+                        "repetition": repetition, "fold": fold,
+                        "filename": filename},
+            RESULT_COLUMNS, values))
+
+    def add_measures(self, batch: str, variant: str, split: str,
+                     ngram_size: str, values: Dict) -> None:
+        """
+        Adds the measures of a variant, replacing existing ones of the
+        same batch, variant and split.
+        :param values: maps the names of MEASURE_COLUMNS to their values
+        (missing values are stored as NULL).
+        """
+        self.__conn.execute(*ResultsDb.__insert(
+            "measures", {"batch": batch, "variant": variant,
+                         "ngram_size": ngram_size, "split": split},
+            MEASURE_COLUMNS, values))
+
+    def query(self, sql: str, params: Tuple = ()) -> Tuple[List[str], List[Tuple]]:
+        """
+        :return: tuple of (column names, rows) of the query.
+        """
+        cursor = self.__conn.execute(sql, params)
+        names = [column[0] for column in cursor.description or []]
+        return names, cursor.fetchall()
+
+    def commit(self) -> None:
+        self.__conn.commit()
+
+    def close(self) -> None:
+        self.__conn.close()
+
+
+def to_txt(value: Optional[object]) -> str:
+    return "" if value is None else str(value)
+
+
+def main():
+    db_file = sys.argv[1]  # database written by stat_collector
+    sql = sys.argv[2]  # query, result is printed tab-separated
+
+    with ResultsDb(db_file) as results_db:
+        names, rows = results_db.query(sql)
+    print("\t".join(names))
+    for row in rows:
+        print("\t".join([to_txt(value) for value in row]))
+
+
+if __name__ == "__main__":
+    main()
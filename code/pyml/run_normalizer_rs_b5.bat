@@ -1,24 +1,8 @@
 :: NGRAM size 3 with UNKNOWN label filled up (k5)
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_k5\FOLDS_k5_1" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_k5\FOLDS_k5_2" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_k5\FOLDS_k5_3" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_k5\FOLDS_k5_4" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_k5\FOLDS_k5_5" "5" "True"
+python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_k5" "5" "True" "5"
 :: NGRAM size 4 with UNKNOWN label filled up (k5)
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_k5\FOLDS_k5_1" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_k5\FOLDS_k5_2" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_k5\FOLDS_k5_3" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_k5\FOLDS_k5_4" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_k5\FOLDS_k5_5" "5" "True"
+python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_k5" "5" "True" "5"
 :: NGRAM size 3 with UNKNOWN label filled up and where letters are replaced by 'x' (k5)
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_X_k5\FOLDS_k5_1" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_X_k5\FOLDS_k5_2" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_X_k5\FOLDS_k5_3" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_X_k5\FOLDS_k5_4" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_X_k5\FOLDS_k5_5" "5" "True"
+python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_3_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG3_X_k5" "5" "True" "5"
 :: NGRAM size 4 with UNKNOWN label filled up and where letters are replaced by 'x' (k5)
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_X_k5\FOLDS_k5_1" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_X_k5\FOLDS_k5_2" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_X_k5\FOLDS_k5_3" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_X_k5\FOLDS_k5_4" "5" "True"
-python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_X_k5\FOLDS_k5_5" "5" "True"
+python .\normalizer.py "C:\temp\Batch_5\NGRAMS\NGRAMS_4_WL_X_UNK.CSV" "C:\temp\Batch_5\Folds\NG4_X_k5" "5" "True" "5"
@@ -1,10 +1,10 @@
 :: k5 (recursively)
-python .\stat_collector.py "C:\temp\Batch_4\Folds\NG3_k5" "FOLD" "comp_output_ng3_k5" "3" "0.9" "true"
-python .\stat_collector.py "C:\temp\Batch_4\Folds\NG4_k5" "FOLD" "comp_output_ng4_k5" "4" "0.9" "true"
-python .\stat_collector.py "C:\temp\Batch_4\Folds\NG3_X_k5" "FOLD" "comp_output_ng3_x_k5" "3" "0.9" "true"
-python .\stat_collector.py "C:\temp\Batch_4\Folds\NG4_X_k5" "FOLD" "comp_output_ng4_x_k5" "4" "0.9" "true"
+python .\stat_collector.py "C:\temp\Batch_4\Folds\NG3_k5" "FOLD" "comp_output_ng3_k5" "3" "0.9" "true" "" "C:\temp\results.db" "Batch_4"
+python .\stat_collector.py "C:\temp\Batch_4\Folds\NG4_k5" "FOLD" "comp_output_ng4_k5" "4" "0.9" "true" "" "C:\temp\results.db" "Batch_4"
+python .\stat_collector.py "C:\temp\Batch_4\Folds\NG3_X_k5" "FOLD" "comp_output_ng3_x_k5" "3" "0.9" "true" "" "C:\temp\results.db" "Batch_4"
+python .\stat_collector.py "C:\temp\Batch_4\Folds\NG4_X_k5" "FOLD" "comp_output_ng4_x_k5" "4" "0.9" "true" "" "C:\temp\results.db" "Batch_4"
 :: k10 (recursively)
-python .\stat_collector.py "C:\temp\Batch_4\Folds\NG3_k10" "FOLD" "comp_output_ng3_k10" "3" "0.9" "true"
-python .\stat_collector.py "C:\temp\Batch_4\Folds\NG4_k10" "FOLD" "comp_output_ng4_k10" "4" "0.9" "true"
-python .\stat_collector.py "C:\temp\Batch_4\Folds\NG3_X_k10" "FOLD" "comp_output_ng3_x_k10" "3" "0.9" "true"
-python .\stat_collector.py "C:\temp\Batch_4\Folds\NG4_X_k10" "FOLD" "comp_output_ng4_x_k10" "4" "0.9" "true"
+python .\stat_collector.py "C:\temp\Batch_4\Folds\NG3_k10" "FOLD" "comp_output_ng3_k10" "3" "0.9" "true" "" "C:\temp\results.db" "Batch_4"
+python .\stat_collector.py "C:\temp\Batch_4\Folds\NG4_k10" "FOLD" "comp_output_ng4_k10" "4" "0.9" "true" "" "C:\temp\results.db" "Batch_4"
+python .\stat_collector.py "C:\temp\Batch_4\Folds\NG3_X_k10" "FOLD" "comp_output_ng3_x_k10" "3" "0.9" "true" "" "C:\temp\results.db" "Batch_4"
+python .\stat_collector.py "C:\temp\Batch_4\Folds\NG4_X_k10" "FOLD" "comp_output_ng4_x_k10" "4" "0.9" "true" "" "C:\temp\results.db" "Batch_4"
@@ -1,23 +1,38 @@
 """
 author: Matthias Fussenegger
 """
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
 import statistics as stat
 import scipy.stats as st
+import json
 import sys
 import os
 import re
 
+import numpy as np
+
+from file_compare import UNK_LABEL, CompareResult, get_sidecar_name
+from results_db import ResultsDb
+import zip_paths
+
 # CONSTANTS
 NORM_DISTRIBUTION = False
 MODEL_FOLDER = "MODEL"
 COMP_DEV_FILE = "comp_dev.txt"
 COMP_TST_FILE = "comp_test.txt"
+CACHE_FILE = ".stat_cache.json"  # parsed results, kept in working directory
+MAX_WORKERS = None  # processes for evaluating folds (None = all cores)
+BOOTSTRAP_SAMPLES = 10000  # replicates of bootstrap and permutation test
+RANDOM_SEED = 42  # seed for drawing the replicates
 REGEX_NUMBER = re.compile(r"\d+")
 REGEX_DECIMAL = re.compile(r"\d{0,3}\.\d+")
 
 
 class ResultRow:
+    # fields which are parsed from a comparison file
+    FIELDS = ("total_lines", "diff_lines", "acc_total", "acc_excl_unk",
+              "matches_excl_unk", "matches_incl_unk", "f1_score")
 
     def __init__(self, filename) -> None:
         super().__init__()
@@ -35,6 +50,13 @@ class ResultRow:
     def get_filename(self) -> str:
         return self.__filename
 
+    def get_values(self) -> Dict[str, str]:
+        return {name: getattr(self, name) for name in ResultRow.FIELDS}
+
+    def set_values(self, values: Dict[str, str]) -> None:
+        for name in ResultRow.FIELDS:
+            setattr(self, name, values[name])
+
     def to_txt(self, incl_f1: bool = True) -> str:
         txt = self.fold_num + "\t" + self.ngram_size + "\t" \
               + self.total_lines + "\t" + self.diff_lines + "\t" \
@@ -45,6 +67,42 @@ class ResultRow:
         return txt
 
 
+class TokenResults:
+
+    def __init__(self, correct: np.ndarray, known: np.ndarray,
+                 actual: np.ndarray, repetition: np.ndarray = None) -> None:
+        """
+        Per-token results of a single comparison file.
+        :param correct: true for each correctly predicted token.
+        :param known: true for each token whose actual label is not UNK.
+        :param actual: actual label of each token.
+        :param repetition: number of the repetition of a repeated split
+        each token belongs to, optional (all tokens in the first one).
+        """
+        super().__init__()
+        self.correct = correct
+        self.known = known
+        self.actual = actual
+        if repetition is None:
+            repetition = np.zeros(len(correct), np.int32)
+        self.repetition = repetition
+
+    @staticmethod
+    def concat(tokens: List, repetitions: List[str] = None):
+        """
+        :param tokens: per-token results to be concatenated.
+        :param repetitions: repetition of each of the results, optional.
+        :return: the concatenated per-token results.
+        """
+        if repetitions is None:
+            repetitions = [""] * len(tokens)
+        _, rep_nums = np.unique(repetitions, return_inverse=True)
+        return TokenResults(np.concatenate([t.correct for t in tokens]),
+                            np.concatenate([t.known for t in tokens]),
+                            np.concatenate([t.actual for t in tokens]),
+                            np.repeat(rep_nums, [len(t.correct) for t in tokens]))
+
+
 # noinspection SpellCheckingInspection
 class Measures:
 
@@ -58,6 +116,9 @@ class Measures:
         self.var_excl_unk = 0.0
         self.conf_total = (0.0, 0.0)
         self.conf_excl_unk = (0.0, 0.0)
+        # bootstrap intervals over all tokens (if available)
+        self.boot_total: Optional[Tuple[float, float]] = None
+        self.boot_excl_unk: Optional[Tuple[float, float]] = None
 
     @staticmethod
     def __conf_norm(alpha: float, data: List[float], mean: float) -> Tuple[float, float]:
@@ -69,6 +130,73 @@ class Measures:
         tt_alpha = (1 + alpha) / 2  # to get a two-tail result
         return st.t.interval(tt_alpha, len(data) - 1, loc=mean, scale=st.sem(data))
 
+    @staticmethod
+    def bootstrap_interval(correct: np.ndarray, repetition: np.ndarray,
+                           confidence: float,
+                           rng: np.random.Generator) -> Tuple[float, float]:
+        """
+        Percentile bootstrap interval of the accuracy over all tokens.
+        When resampling n tokens with replacement, the number of correct
+        tokens is binomially distributed, so all replicates are drawn in
+        one batch without resampling the tokens themselves. The tokens
+        are resampled within each repetition of a repeated split, as all
+        repetitions evaluate the same tokens (not independent ones), and
+        the intervals of all repetitions are averaged (weighted by tokens).
+        :param correct: true for each correctly predicted token.
+        :param repetition: repetition each token belongs to.
+        :param confidence: coverage of the two-sided interval.
+        :param rng: random generator to draw the replicates.
+        :return: tuple of (lower bound, upper bound).
+        """
+        tail = (1 - confidence) / 2
+        bounds = []
+        weights = []
+        for rep_num in np.unique(repetition):
+            rep_correct = correct[repetition == rep_num]
+            num_tokens = len(rep_correct)
+            acc = np.count_nonzero(rep_correct) / num_tokens
+            replicates = rng.binomial(
+                num_tokens, acc, BOOTSTRAP_SAMPLES) / num_tokens
+            bounds.append(np.quantile(replicates, [tail, 1 - tail]))
+            weights.append(num_tokens)
+        if len(bounds) == 0:
+            return 0.0, 0.0
+        lower, upper = np.average(bounds, axis=0, weights=weights)
+        return float(lower), float(upper)
+
+    @staticmethod
+    def permutation_test(correct_a: np.ndarray, correct_b: np.ndarray,
+                         rng: np.random.Generator) -> Tuple[float, float]:
+        """
+        Paired permutation test of the difference in accuracy of two
+        models on the same tokens. Swapping the results of both models
+        only changes tokens which exactly one model predicted correctly,
+        so the permuted differences follow a (shifted) binomial
+        distribution and all replicates are drawn in one batch.
+        :param correct_a: true for each token model A predicted correctly.
+        :param correct_b: true for each token model B predicted correctly.
+        :param rng: random generator to draw the replicates.
+        :return: tuple of (difference in accuracy A - B, two-sided p-value).
+        """
+        if len(correct_a) != len(correct_b):
+            raise ValueError("Both models must be evaluated on the same tokens.")
+        if len(correct_a) == 0:
+            return 0.0, 1.0
+        only_a = np.count_nonzero(correct_a & ~correct_b)
+        only_b = np.count_nonzero(~correct_a & correct_b)
+        discordant = only_a + only_b
+        observed = only_a - only_b
+        permuted = 2 * rng.binomial(discordant, 0.5, BOOTSTRAP_SAMPLES) - discordant
+        extreme = np.count_nonzero(np.abs(permuted) >= abs(observed))
+        p_value = (extreme + 1) / (BOOTSTRAP_SAMPLES + 1)
+        return float(observed / len(correct_a)), float(p_value)
+
+    def to_boot_txt(self) -> str:
+        if self.boot_total is None or self.boot_excl_unk is None:
+            return ""
+        return str(self.boot_total[0]) + "\t" + str(self.boot_total[1]) + "\t" \
+            + str(self.boot_excl_unk[0]) + "\t" + str(self.boot_excl_unk[1])
+
     def to_txt(self) -> str:
         return str(self.acc_avg_total) + "\t" + str(self.acc_avg_excl_unk) + "\t" \
                + str(self.stdev_total) + "\t" + str(self.stdev_excl_unk) + "\t" \
@@ -77,11 +205,14 @@ class Measures:
                + str(self.conf_excl_unk[0]) + "\t" + str(self.conf_excl_unk[1])
 
     @staticmethod
-    def from_results(results: List[ResultRow], confidence: float):
+    def from_results(results: List[ResultRow], confidence: float,
+                     tokens: TokenResults = None):
         """
         Factory method which returns a new instance of this class.
         :param confidence: alpha for confidence interval.
         :param results: results which are used to calculate measures.
+        :param tokens: per-token results of all folds, optional. If
+        specified, bootstrap intervals are calculated as well.
         :return: an instance of this class.
         """
         meas = Measures()  # to be returned
@@ -110,6 +241,14 @@ class Measures:
                 confidence, acc_total, mean=meas.acc_avg_total)
             meas.conf_excl_unk = Measures.__conf_t(
                 confidence, acc_excl_unk, mean=meas.acc_avg_excl_unk)
+        # bootstrap intervals over all tokens instead of fold accuracies
+        if tokens is not None and BOOTSTRAP_SAMPLES > 0:
+            rng = np.random.default_rng(RANDOM_SEED)
+            meas.boot_total = Measures.bootstrap_interval(
+                tokens.correct, tokens.repetition, confidence, rng)
+            meas.boot_excl_unk = Measures.bootstrap_interval(
+                tokens.correct[tokens.known], tokens.repetition[tokens.known],
+                confidence, rng)
 
         return meas
 
@@ -117,26 +256,32 @@ class Measures:
 def get_dirs(path: str, recurse: bool = False) -> List[Tuple[str, str]]:
     """
     Get all directories from path (optionally recursively).
-    :param path: the path of which to get all directories.
+    :param path: the path of which to get all directories, which may
+    also lead into a ZIP archive (see zip_paths).
     :param recurse: true to recursively search path.
     :return: list of tuples of (<root>, <dirname>).
     """
     dirs = []
-    if recurse:
-        for root, dirnames, _ in os.walk(path):
-            dirs.extend([(root, dirname) for dirname in dirnames])
-    else:  # only consider directories in specified path
-        dirs = [(path, file) for file in os.listdir(path)
-                if os.path.isdir(os.path.join(path, file))]
+    roots = [path]
+    while len(roots) != 0:  # top-down, in the same order as os.walk
+        root = roots.pop()
+        if zip_paths.is_in_archive(root):  # directories of archive members
+            subdirs = [(name, True) for name, is_dir
+                       in zip_paths.list_dir(root) if is_dir]
+        else:
+            with os.scandir(root) as entries:  # file type comes with entry
+                subdirs = [(entry.name, not entry.is_symlink())
+                           for entry in entries if entry.is_dir()]
+        dirs.extend([(root, name) for name, _ in subdirs])
+        if recurse:
+            roots.extend(reversed([os.path.join(root, name)
+                                   for name, is_walked in subdirs if is_walked]))
 
     return dirs
 
 
 def read_file(filename: str, encoding: str = "utf-8") -> List[str]:
-    with open(filename, "r", encoding=encoding) as file:
-        lines = file.readlines()
-
-    return lines
+    return zip_paths.read_lines(filename, encoding)  # file or archive member
 
 
 def write_file(filename: str, results: List[ResultRow], measures: Measures = None) -> None:
@@ -147,14 +292,55 @@ def write_file(filename: str, results: List[ResultRow], measures: Measures = Non
                 txt_line += result.to_txt(False) + "\t" + \
                             measures.to_txt() + "\t" + \
                             str(result.f1_score)
+                if measures.boot_total is not None:  # append bootstrap intervals
+                    txt_line += "\t" + measures.to_boot_txt()
             else:  # ignore measures and just print results
                 txt_line += result.to_txt()
 
             out_file.write(txt_line + "\n")
 
 
+def is_sidecar_valid(filename: str) -> bool:
+    """
+    :return: true if the sidecar of the comparison file exists and has
+    not been written before the comparison file.
+    """
+    sidecar = get_sidecar_name(filename)
+    try:
+        return os.stat(sidecar).st_mtime >= os.stat(filename).st_mtime
+    except OSError:
+        return False
+
+
+def to_report_decimal(value: float) -> str:
+    """
+    :return: the value as it is parsed from a comparison file, so that
+    results of sidecars and comparison files are always the same.
+    """
+    match = REGEX_DECIMAL.search(str(value))
+    return match.group(0) if match is not None else str(value)
+
+
+def eval_sidecar(filename: str, fold_num: str, ng_size: str) -> ResultRow:
+    comp = CompareResult.load(get_sidecar_name(filename), load_ids=False)
+    result: ResultRow = ResultRow(filename)
+    result.fold_num = fold_num
+    result.ngram_size = ng_size
+    result.total_lines = str(comp.total_tokens)
+    result.diff_lines = str(comp.diff_count)
+    result.acc_total = to_report_decimal(comp.acc_total)
+    result.acc_excl_unk = to_report_decimal(comp.acc_excl_unk)
+    result.matches_excl_unk = str(comp.true_positives)
+    result.matches_incl_unk = str(comp.true_negatives + comp.true_positives)
+    result.f1_score = to_report_decimal(comp.f1_score)
+
+    return result
+
+
 # noinspection PyCompatibility
 def eval_stat(filename: str, fold_num: str, ng_size: str) -> ResultRow:
+    if is_sidecar_valid(filename):  # no need to parse the text
+        return eval_sidecar(filename, fold_num, ng_size)
     lines = read_file(filename)
     result: ResultRow = ResultRow(filename)
     result.fold_num = fold_num
@@ -194,6 +380,188 @@ def eval_stat(filename: str, fold_num: str, ng_size: str) -> ResultRow:
     return result
 
 
+def get_cache_key(filename: str) -> Optional[List[int]]:
+    return zip_paths.get_stat_key(filename)
+
+
+def load_cache(filename: str) -> Dict[str, Dict]:
+    try:
+        with open(filename, "r", encoding="utf-8") as in_file:
+            return json.load(in_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(filename: str, cache: Dict[str, Dict]) -> None:
+    tmp_file = filename + ".tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as out_file:
+            json.dump(cache, out_file)
+        os.replace(tmp_file, filename)
+    except OSError:
+        pass  # e.g. read-only location, results are evaluated next time
+
+
+def eval_stats(files: List[Tuple[str, str]], ng_size: str,
+               cache_file: str) -> List[ResultRow]:
+    """
+    Evaluates the comparison files of all folds. Files which have not
+    changed since they have been evaluated are taken from the cache,
+    all others are evaluated concurrently.
+    :param files: list of tuples of (<comparison file>, <fold number>).
+    :param ng_size: is added to each result.
+    :param cache_file: file of the cache, which is updated.
+    :return: the results in the order of the files.
+    """
+    cache = load_cache(cache_file)
+    results: List[Optional[ResultRow]] = [None] * len(files)
+    keys = [get_cache_key(filename) for filename, _ in files]
+    pending = []
+
+    for i, (filename, fold_num) in enumerate(files):
+        entry = cache.get(os.path.abspath(filename))
+        if keys[i] is not None and entry is not None and entry["key"] == keys[i]:
+            result = ResultRow(filename)
+            result.fold_num = fold_num
+            result.ngram_size = ng_size
+            result.set_values(entry["values"])
+            results[i] = result
+        else:
+            pending.append(i)
+
+    if len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            evaluated = list(executor.map(
+                eval_stat, [files[i][0] for i in pending],
+                [files[i][1] for i in pending], [ng_size] * len(pending)))
+    else:
+        evaluated = [eval_stat(files[i][0], files[i][1], ng_size)
+                     for i in pending]
+
+    for i, result in zip(pending, evaluated):
+        print("Evaluated: %s" % result.get_filename())
+        results[i] = result
+        if keys[i] is not None:
+            cache[os.path.abspath(files[i][0])] = {
+                "key": keys[i], "values": result.get_values()}
+
+    if len(pending) != 0:  # forget files which do not exist anymore
+        cache = {filename: entry for filename, entry in cache.items()
+                 if zip_paths.exists(filename)}
+        save_cache(cache_file, cache)
+
+    return results
+
+
+def load_tokens(filename: str) -> Optional[TokenResults]:
+    """
+    :return: the per-token results of a comparison file from its sidecar
+    or None if there is no (valid) sidecar which holds them.
+    """
+    if not is_sidecar_valid(filename):
+        return None
+    comp = CompareResult.load(get_sidecar_name(filename))
+    if len(comp.actual_ids) != comp.total_tokens:
+        return None  # e.g. compared in streaming mode
+    labels = np.array(comp.labels, dtype=str)
+    is_unk = np.char.startswith(labels, UNK_LABEL)
+    return TokenResults(comp.actual_ids == comp.predicted_ids,
+                        ~is_unk[comp.actual_ids], labels[comp.actual_ids])
+
+
+def load_all_tokens(results: List[ResultRow],
+                    working_dir: str) -> Optional[TokenResults]:
+    """
+    :param results: results of which the per-token results are loaded.
+    :param working_dir: location of the folds, to tell repetitions apart.
+    :return: the per-token results of all results concatenated or None
+    if they are not available for all results.
+    """
+    tokens = []
+    for result in results:
+        token_results = load_tokens(result.get_filename())
+        if token_results is None:
+            print("No per-token results for: %s" % result.get_filename())
+            return None
+        tokens.append(token_results)
+
+    return TokenResults.concat(tokens, [get_repetition(
+        result.get_filename(), working_dir) for result in results])
+
+
+def write_perm_file(filename: str, tokens: TokenResults,
+                    baseline: TokenResults) -> None:
+    """
+    Tests the accuracies (total and excluding UNK) against the baseline
+    and writes one line per accuracy with both accuracies, their
+    difference and the p-value of the paired permutation test.
+    """
+    if not np.array_equal(tokens.actual, baseline.actual):
+        raise ValueError("Baseline is not evaluated on the same tokens.")
+    rng = np.random.default_rng(RANDOM_SEED)
+    with open(filename, "w", encoding="utf-8") as out_file:
+        for name, mask in (("total", slice(None)),
+                           ("excl_unk", tokens.known)):
+            correct, correct_base = tokens.correct[mask], baseline.correct[mask]
+            diff, p_value = Measures.permutation_test(
+                correct, correct_base, rng)
+            acc = np.count_nonzero(correct) / max(len(correct), 1)
+            acc_base = np.count_nonzero(correct_base) / max(len(correct), 1)
+            out_file.write(name + "\t" + str(acc) + "\t" + str(acc_base)
+                           + "\t" + str(diff) + "\t" + str(p_value) + "\n")
+
+
+def to_number(value: str) -> Optional[float]:
+    return float(value) if len(value) != 0 else None
+
+
+def get_repetition(filename: str, working_dir: str) -> str:
+    """
+    :return: the directory of the fold of the comparison file (relative to
+    the location of the folds), which tells the repetitions of a repeated
+    split apart, e.g. FOLDS_k5_2. Empty if the folds are not repeated.
+    """
+    parts = zip_paths.REGEX_SEP.split(os.path.relpath(filename, working_dir))
+    return "/".join(parts[:-3])  # strip <fold>/MODEL/<comparison file>
+
+
+def store_results(db_file: str, batch: str, variant: str, split: str,
+                  ngram_size: str, working_dir: str, results: List[ResultRow],
+                  measures: Measures) -> None:
+    """
+    Adds the results of all folds and their measures to the results
+    store. Results which have been added before are replaced.
+    """
+    with ResultsDb(db_file) as results_db:
+        for result in results:
+            values = {name: to_number(value)
+                      for name, value in result.get_values().items()}
+            values["total_tokens"] = values.pop("total_lines")
+            values["diff_tokens"] = values.pop("diff_lines")
+            results_db.add_result(batch, variant, split, ngram_size,
+                                  get_repetition(result.get_filename(),
+                                                 working_dir),
+                                  result.fold_num, result.get_filename(),
+                                  values)
+        values = {"num_folds": len(results),
+                  "acc_avg_total": measures.acc_avg_total,
+                  "acc_avg_excl_unk": measures.acc_avg_excl_unk,
+                  "stdev_total": measures.stdev_total,
+                  "stdev_excl_unk": measures.stdev_excl_unk,
+                  "var_total": measures.var_total,
+                  "var_excl_unk": measures.var_excl_unk,
+                  "conf_total_lower": float(measures.conf_total[0]),
+                  "conf_total_upper": float(measures.conf_total[1]),
+                  "conf_excl_unk_lower": float(measures.conf_excl_unk[0]),
+                  "conf_excl_unk_upper": float(measures.conf_excl_unk[1])}
+        if measures.boot_total is not None:
+            values.update({"boot_total_lower": measures.boot_total[0],
+                           "boot_total_upper": measures.boot_total[1],
+                           "boot_excl_unk_lower": measures.boot_excl_unk[0],
+                           "boot_excl_unk_upper": measures.boot_excl_unk[1]})
+        results_db.add_measures(batch, variant, split, ngram_size, values)
+
+
 def comp_result(result: ResultRow) -> int:
     """
     Returns the key for comparison of the result object.
@@ -211,11 +579,22 @@ def main():
     confidence = float(sys.argv[5])  # confidence for confidence interval
 
     recurse = False
-    if len(sys.argv) == 7:
+    if len(sys.argv) > 6:
         recurse = True if sys.argv[6].lower() == "true" else False
-
-    out_lines_dev = []
-    out_lines_tst = []
+    # location of folds of another model to be tested against (optional)
+    baseline_dir = sys.argv[7] if len(sys.argv) > 7 and sys.argv[7] else None
+    # results store (SQLite) to add all results to (optional)
+    db_file = sys.argv[8] if len(sys.argv) > 8 else None
+    # name of the batch in the results store (required with a store),
+    # e.g. Batch_4, as the folds of all batches are named alike
+    batch = sys.argv[9] if len(sys.argv) > 9 else ""
+    if db_file is not None and len(batch) == 0:
+        sys.exit("A batch id is required to add results to: %s" % db_file)
+
+    # results are written next to the archive if folds are archived
+    output_dir = zip_paths.get_local_dir(working_dir)
+    dev_files = []
+    tst_files = []
 
     regex_txt = r"^" + fold_prefix + r"\d{0,5}$"
     regex_dir = re.compile(regex_txt)
@@ -233,29 +612,67 @@ def main():
             print("Processing models in: %s" % fullname)
             comp_dev_name = os.path.join(fullname, COMP_DEV_FILE)
             comp_tst_name = os.path.join(fullname, COMP_TST_FILE)
-            out_lines_dev.append(eval_stat(comp_dev_name, fold_num, ngram_size))
-            out_lines_tst.append(eval_stat(comp_tst_name, fold_num, ngram_size))
-
+            dev_files.append((comp_dev_name, fold_num))
+            tst_files.append((comp_tst_name, fold_num))
+
+    # unchanged folds are taken from the cache, others are evaluated
+    cache_file = os.path.join(output_dir, CACHE_FILE)
+    results = eval_stats(dev_files + tst_files, ngram_size, cache_file)
+    out_lines_dev = results[:len(dev_files)]
+    out_lines_tst = results[len(dev_files):]
     out_lines_dev.sort(key=comp_result)
     out_lines_tst.sort(key=comp_result)
 
     dev_file_name = output_file_prefix + "_dev.txt"
     tst_file_name = output_file_prefix + "_tst.txt"
 
+    tokens_dev = load_all_tokens(out_lines_dev, working_dir) \
+        if BOOTSTRAP_SAMPLES > 0 else None
+    tokens_tst = load_all_tokens(out_lines_tst, working_dir) \
+        if BOOTSTRAP_SAMPLES > 0 else None
+
     if len(out_lines_dev) != 0:
-        meas_dev = Measures.from_results(out_lines_dev, confidence)
-        write_file(os.path.join(working_dir, dev_file_name), out_lines_dev, meas_dev)
+        meas_dev = Measures.from_results(out_lines_dev, confidence, tokens_dev)
+        write_file(os.path.join(output_dir, dev_file_name), out_lines_dev, meas_dev)
         print("DEV comparison file written to: %s" % dev_file_name)
+        if db_file is not None:
+            store_results(db_file, batch, output_file_prefix, "dev",
+                          ngram_size, working_dir, out_lines_dev, meas_dev)
+            print("DEV results added to: %s" % db_file)
     else:
         print("DEV comparison file is empty!")
 
     if len(out_lines_tst) != 0:
-        meas_tst = Measures.from_results(out_lines_tst, confidence)
-        write_file(os.path.join(working_dir, tst_file_name), out_lines_tst, meas_tst)
+        meas_tst = Measures.from_results(out_lines_tst, confidence, tokens_tst)
+        write_file(os.path.join(output_dir, tst_file_name), out_lines_tst, meas_tst)
         print("TEST comparison file written to: %s" % tst_file_name)
+        if db_file is not None:
+            store_results(db_file, batch, output_file_prefix, "test",
+                          ngram_size, working_dir, out_lines_tst, meas_tst)
+            print("TEST results added to: %s" % db_file)
     else:
         print("TEST comparison file is empty!")
 
+    if baseline_dir is None:
+        return
+
+    # test against the same folds of the baseline (paired by path)
+    for tokens, out_lines, name in ((tokens_dev, out_lines_dev, "_dev_perm.txt"),
+                                    (tokens_tst, out_lines_tst, "_tst_perm.txt")):
+        if tokens is None or len(out_lines) == 0:
+            print("Permutation test skipped: %s" % name)
+            continue
+        baseline = load_all_tokens([ResultRow(os.path.join(
+            baseline_dir, os.path.relpath(result.get_filename(), working_dir)))
+            for result in out_lines], baseline_dir)
+        if baseline is None:
+            print("Permutation test skipped: %s" % name)
+            continue
+        perm_file_name = output_file_prefix + name
+        write_perm_file(os.path.join(output_dir, perm_file_name),
+                        tokens, baseline)
+        print("Permutation test written to: %s" % perm_file_name)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,63 @@
+"""
+author: Matthias Fussenegger
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import file_compare
+import stat_collector
+
+
+class StatCollectorTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.__tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.__tmp_dir.cleanup()
+
+    def __eval_both(self, actual_l, predicted_l):
+        """
+        :return: values of the comparison file read via its sidecar and
+        values of the same file parsed from its text.
+        """
+        filename = os.path.join(self.__tmp_dir.name, "comp_dev.txt")
+        file_compare.write_report(
+            filename, file_compare.compare(actual_l, predicted_l))
+        self.assertTrue(stat_collector.is_sidecar_valid(filename))
+        from_sidecar = stat_collector.eval_stat(filename, "1", "3")
+        os.remove(file_compare.get_sidecar_name(filename))
+        from_text = stat_collector.eval_stat(filename, "1", "3")
+        return from_sidecar, from_text
+
+    def testSidecarEqualsText(self):
+        from_sidecar, from_text = self.__eval_both(
+            ["unbekannt datum betrag\n", "betrag unbekannt datum\n"],
+            ["unbekannt datum datum\n", "betrag betrag datum\n"])
+        self.assertEqual(from_text.get_values(), from_sidecar.get_values())
+        self.assertEqual(from_text.to_txt(), from_sidecar.to_txt())
+
+    def testSidecarEqualsTextWithoutPositives(self):
+        # precision and recall are zero, F1-score is reported as in the text
+        from_sidecar, from_text = self.__eval_both(
+            ["datum unbekannt\n"], ["betrag unbekannt\n"])
+        self.assertEqual("1.0", from_text.f1_score)
+        self.assertEqual(from_text.get_values(), from_sidecar.get_values())
+
+    def testBootstrapOverRepetitions(self):
+        # repetitions evaluate the same tokens, the interval must not shrink
+        correct = np.arange(200) % 4 != 0
+        single = stat_collector.Measures.bootstrap_interval(
+            correct, np.zeros(200), 0.95, np.random.default_rng(1))
+        repeated = stat_collector.Measures.bootstrap_interval(
+            np.tile(correct, 5), np.repeat(np.arange(5), 200), 0.95,
+            np.random.default_rng(1))
+        self.assertAlmostEqual(single[1] - single[0],
+                               repeated[1] - repeated[0], delta=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
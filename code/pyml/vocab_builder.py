@@ -1,16 +1,110 @@
 """
 author: Matthias Fussenegger
+
+Builds the vocabulary of source sentences, an NGRAMS file (plain, .zip or
+.gz) or an NGRAMS store. Of NGRAMS lines, only the source n-grams are
+counted (not the labels, docids or bounding boxes). Words are counted in chunks of lines, which are
+processed concurrently, and written in descending order of frequency
+(words of the same frequency in alphabetical order). The vocabulary starts
+with the special tokens of NMT, so that NMT can use it as it is:
+python vocab_builder.py <sentences> <vocab> [<min count>] [<max size>]
 """
-from typing import List
+from typing import Iterable, Iterator, List, Optional
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 import sys
 import os
+import numpy as np
+
+from ngrams_reader import NgramsFile, NgramRecord, is_compressed, iter_lines
+from ngrams_store import NgramsStore, is_store
+
+UNK = "<unk>"
+SOS = "<s>"
+EOS = "</s>"
+SPECIAL_TOKENS = [UNK, SOS, EOS]  # first words of each vocabulary
+
+CHUNK_LINES = 100000  # lines counted at once by a single process
+MAX_WORKERS = None  # processes for counting words (None = all cores)
+
+
+def count_words(lines: Iterable[str]) -> Counter:
+    counts = Counter()
+    for sentence in lines:
+        if "\t" in sentence:  # NGRAMS line, only count its source n-gram
+            sentence = NgramRecord.parse(sentence).src
+        counts.update(word for word in sentence.strip().split(" ")
+                      if len(word) != 0)
+    return counts
+
+
+def count_range(lines: NgramsFile, start: int, stop: int) -> Counter:
+    return count_words(lines[idx] for idx in range(start, stop))
 
 
-def read_file(filename: str, encoding: str = "utf-8") -> List[str]:
-    with open(filename, "r", encoding=encoding) as file:
-        lines = file.readlines()
+def iter_chunks(lines: Iterator[str]) -> Iterator[List[str]]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == CHUNK_LINES:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
-    return lines
+
+def count_file(sentences: str) -> Counter:
+    """
+    Counts the words of a plain or compressed file concurrently.
+    """
+    counts = Counter()
+    max_pending = (MAX_WORKERS or os.cpu_count() or 1) * 2
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        if is_compressed(sentences):  # stream chunks to the processes
+            pending = []
+            for chunk in iter_chunks(iter_lines(sentences)):
+                pending.append(executor.submit(count_words, chunk))
+                if len(pending) > max_pending:  # bound memory
+                    counts.update(pending.pop(0).result())
+            for future in pending:
+                counts.update(future.result())
+        else:  # processes map the file themselves
+            with NgramsFile(sentences) as lines:
+                starts = range(0, len(lines), CHUNK_LINES)
+                for result in executor.map(
+                        count_range, [lines] * len(starts), starts,
+                        [min(s + CHUNK_LINES, len(lines)) for s in starts]):
+                    counts.update(result)
+    return counts
+
+
+def count_store(store: NgramsStore) -> Counter:
+    """
+    Counts the tokens of a store, only tokens which are actually used.
+    """
+    totals = np.zeros(len(store.token_dict), np.int64)
+    for start in range(0, len(store), CHUNK_LINES):
+        tokens = store.tokens[start:start + CHUNK_LINES].ravel()
+        totals += np.bincount(tokens, minlength=len(totals))
+    return Counter({store.token_dict[token_id]: int(totals[token_id])
+                    for token_id in np.flatnonzero(totals)
+                    if len(store.token_dict[token_id]) != 0})
+
+
+def build_vocab(counts: Counter, min_count: int = 1,
+                max_size: Optional[int] = None) -> List[str]:
+    """
+    :param counts: frequency of each word.
+    :param min_count: words which occur less often are left out.
+    :param max_size: maximum size of the vocabulary (including the special
+    tokens), the most frequent words are kept. None for no limit.
+    :return: the special tokens followed by the words by frequency.
+    """
+    words = sorted([(-count, word) for word, count in counts.items()
+                    if count >= min_count and word not in SPECIAL_TOKENS])
+    if max_size is not None:
+        words = words[:max(0, max_size - len(SPECIAL_TOKENS))]
+    return SPECIAL_TOKENS + [word for _, word in words]
 
 
 def write_file(filename: str, lines: List[str]) -> None:
@@ -22,21 +116,18 @@ def write_file(filename: str, lines: List[str]) -> None:
 def main():
     sentences = sys.argv[1]  # source sentences (to be read)
     target_file = sys.argv[2]  # file to be created (vocabulary)
+    min_count = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    max_size = int(sys.argv[4]) if len(sys.argv) > 4 else None
 
-    vocab = set()
-    vocab_lines = []
-
-    for sentence in read_file(sentences):
-        words = sentence.strip().split(" ")
-        for word in words:
-            if len(word) != 0:
-                vocab.add(word)
-
-    # build output list (to be stored away)
-    for word in vocab:
-        vocab_lines.append(word)
+    if is_store(sentences):
+        counts = count_store(NgramsStore.load(sentences))
+    else:
+        counts = count_file(sentences)
 
+    vocab_lines = build_vocab(counts, min_count, max_size)
     write_file(target_file, vocab_lines)
+    print("Vocabulary of %d words written to: %s"
+          % (len(vocab_lines), target_file))
 
 
 if __name__ == "__main__":
@@ -5,12 +5,19 @@ GENSIM library has a known bug with regards to loss calculation:
 https://stackoverflow.com/questions/52038651/loss-does-not-decrease-during-training-word2vec-gensim
 """
 
-from typing import List, AnyStr, Tuple
+from typing import List, AnyStr, Iterator
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from gensim.models import Word2Vec
 from gensim.models.callbacks import CallbackAny2Vec
 
 import sys
+import os
+import time
+import hashlib
+import json
 import logging as log
+import numpy as np
 
 # CONSTANTS
 IS_LOAD_MODEL = True
@@ -18,25 +25,83 @@ FIND_SIMILAR_DN_POS = ["gesamtbetrag", "total"]
 FIND_SIMILAR_DN_NEG = []
 FIND_SIMILAR_DT_POS = ["datum", "rechnungsdatum"]
 FIND_SIMILAR_DT_NEG = []
+# write the filtered corpus once and let gensim read it with all workers,
+# instead of feeding sentences from Python (which does not scale with cores)
+IS_CORPUS_FILE = True
+CORPUS_FILE_SUFFIX = "_corpus.txt"
+NUM_WORKERS = None  # worker threads for training (None = all cores)
+# stop if the smoothed loss did not improve for PATIENCE epochs by at least
+# MIN_DELTA (relative to the best smoothed loss so far)
+IS_EARLY_STOPPING = True
+PATIENCE = 500
+MIN_DELTA = 0.001
+LOSS_SMOOTHING = 0.9  # weight of the previous smoothed loss
+STOP_FILE_SUFFIX = "_stop_epoch.txt"
+# binary embedding matrix aligned to an NMT vocabulary, next to the text
+# format (<model>.src), which NMT prefers to the text format
+EMBED_NPY_SUFFIX = ".src.npy"
+EMBED_HEADER_SUFFIX = ".src.json"
+SAVE_DELAY = 100  # epochs between two checkpoints
+CHECKPOINT_KEEP = 5  # number of latest checkpoints which are kept
 
 # GLOBALS
 word_whitelist = {}
 
 
 class EpochSaver(CallbackAny2Vec):
+    """
+    Saves the word vectors as checkpoint (binary word2vec format) each
+    SAVE_DELAY epochs. A copy of the vectors is written by a background
+    thread, so that training goes on, and only the latest CHECKPOINT_KEEP
+    checkpoints are kept. The complete model is saved by main at the end.
+    """
+
     def __init__(self, path):
         self.__epoch = 0
         self.__path = path
         self.__delay = 0
+        self.__executor = ThreadPoolExecutor(max_workers=1)  # in order
+        self.__futures = []  # to report checkpoints which failed
+        self.__checkpoints = deque()
 
     def on_epoch_end(self, model):
         self.__delay += 1
         self.__epoch += 1
-        if self.__delay == 100:  # save each 100 epoch
-            model.save(self.__path)
-            model.wv.save_word2vec_format(self.__path + "_word2vec.txt")
+        if self.__delay == SAVE_DELAY:
+            filename = "%s_epoch%d.bin" % (self.__path, self.__epoch)
+            self.__futures.append((filename, self.__executor.submit(
+                self.__save, filename, list(model.wv.index2word),
+                model.wv.vectors.copy())))
             self.__delay = 0
 
+    def __save(self, filename: str, words: List[str], vectors: np.ndarray):
+        write_vectors(filename, words, vectors)  # errors are kept by future
+        log.info("Checkpoint written to: %s" % filename)
+        self.__checkpoints.append(filename)
+        while len(self.__checkpoints) > CHECKPOINT_KEEP:
+            try:
+                os.remove(self.__checkpoints.popleft())
+            except OSError:
+                pass  # ignore
+
+    def close(self) -> int:
+        """
+        Waits until all pending checkpoints are written and reports all
+        checkpoints which could not be written (with any error).
+        :return: the number of checkpoints which could not be written.
+        """
+        self.__executor.shutdown(wait=True)
+        num_failed = 0
+        for filename, future in self.__futures:
+            error = future.exception()
+            if error is not None:
+                num_failed += 1
+                msg = "Checkpoint %s not written: %r" % (filename, error)
+                print(msg)
+                log.error(msg, exc_info=error)
+        self.__futures.clear()
+        return num_failed
+
 
 class EpochLogger(CallbackAny2Vec):
     PRINT_DELAY = 100
@@ -69,6 +134,75 @@ class EpochLogger(CallbackAny2Vec):
             sys.exit(stop_msg)
 
 
+class EarlyStopping(CallbackAny2Vec):
+    """
+    Stops training (like EpochLogger) once the loss reached a plateau. The
+    loss of each epoch is smoothed with an exponential moving average, as
+    it varies a lot from epoch to epoch.
+    """
+
+    def __init__(self, patience: int = PATIENCE, min_delta: float = MIN_DELTA):
+        self.__patience = patience
+        self.__min_delta = min_delta
+        self.__epoch = 0
+        self.__prev_loss = 0
+        self.__smoothed_loss = None
+        self.__best_loss = None
+        self.__best_epoch = 0
+        self.__stop_epoch = None
+
+    def on_epoch_end(self, model):
+        self.__epoch += 1
+        loss = model.get_latest_training_loss()
+        cur_loss = loss - self.__prev_loss
+        self.__prev_loss = loss
+        if self.__smoothed_loss is None:
+            self.__smoothed_loss = cur_loss
+        else:
+            self.__smoothed_loss = LOSS_SMOOTHING * self.__smoothed_loss \
+                                   + (1 - LOSS_SMOOTHING) * cur_loss
+        if self.__best_loss is None \
+                or self.__smoothed_loss < self.__best_loss * (1 - self.__min_delta):
+            self.__best_loss = self.__smoothed_loss
+            self.__best_epoch = self.__epoch
+        elif self.__epoch - self.__best_epoch >= self.__patience:
+            self.__stop_epoch = self.__epoch
+            stop_msg = "Loss did not improve since epoch %s, stopped at epoch %s." \
+                       % (self.__best_epoch, self.__epoch)
+            print(stop_msg)
+            log.info(stop_msg)
+            sys.exit(stop_msg)
+
+    def get_stop_epoch(self):
+        """
+        :return: the epoch in which training was stopped or None.
+        """
+        return self.__stop_epoch
+
+
+class SpeedLogger(CallbackAny2Vec):
+    """
+    Measures the throughput of training in words (of the corpus) per second.
+    """
+
+    def __init__(self):
+        self.__words = 0
+        self.__seconds = 0.0
+        self.__epoch_start = 0.0
+
+    def on_epoch_begin(self, model):
+        self.__epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, model):
+        seconds = time.perf_counter() - self.__epoch_start
+        self.__words += model.corpus_total_words
+        self.__seconds += seconds
+        log.info("Words/sec: %.0f" % (model.corpus_total_words / seconds))
+
+    def get_words_per_sec(self) -> float:
+        return self.__words / self.__seconds if self.__seconds > 0 else 0.0
+
+
 def read_file(filename: str, encoding: str = "utf-8") -> List[AnyStr]:
     with open(filename, "r", encoding=encoding) as file:
         lines = file.readlines()
@@ -76,15 +210,10 @@ def read_file(filename: str, encoding: str = "utf-8") -> List[AnyStr]:
     return lines
 
 
-def parse_lines(lines: List[AnyStr]) -> str:
-    text = ""
-    for line in lines:
-        if len(line) == 0 \
-                or line.isspace() \
-                or line.startswith("<<h>>"):
-            continue
-        text += line
-    return text
+def is_skipped(line: str) -> bool:
+    return len(line) == 0 \
+        or line.isspace() \
+        or line.startswith("<<h>>")
 
 
 def filter_word(word: str) -> bool:
@@ -111,30 +240,102 @@ def filter_word(word: str) -> bool:
     return False  # accept word
 
 
-def generate_training_data(sentences: List[List[str]], win_size: int) \
-        -> Tuple[List[list], List[List[str]]]:
-    data = []
-    sentences_f = []
-    sentence_f = []
-    # filter some words first
-    for sentence in sentences:
-        for word_index, word in enumerate(sentence):
-            if not filter_word(word):
-                sentence_f.append(word)
-        if len(sentence_f) != 0:
-            sentences_f.append(sentence_f.copy())
-            sentence_f.clear()
-
-    for sentence in sentences_f:
-        for word_index, word in enumerate(sentence):
-            # consider bounds for outer words
-            for nb_word in sentence[
-                           max(word_index - win_size, 0):
-                           min(word_index + win_size, len(sentence)) + 1]:
-                if nb_word != word:
-                    data.append([word, nb_word])
-
-    return data, sentences_f
+def parse_sentence(line: str) -> List[str]:
+    """
+    :return: the filtered words of a line of the corpus.
+    """
+    line = line.lower()
+    line = line.replace("<s> ", "")
+    line = line.replace(" </s>", "")
+    return [word for word in line.split() if not filter_word(word)]
+
+
+class Sentences:
+    """
+    Streams the sentences of a corpus (one per line), so that neither the
+    corpus nor its sentences have to be kept in memory. Iterating again
+    reads the corpus again, which gensim does once per epoch.
+    """
+
+    def __init__(self, filename: str, encoding: str = "utf-8") -> None:
+        super().__init__()
+        self.__filename = filename
+        self.__encoding = encoding
+
+    def __iter__(self) -> Iterator[List[str]]:
+        with open(self.__filename, "r", encoding=self.__encoding) as file:
+            for line in file:
+                if is_skipped(line):
+                    continue
+                sentence = parse_sentence(line)
+                if len(sentence) != 0:
+                    yield sentence
+
+
+def write_vectors(filename: str, words: List[str], vectors: np.ndarray) -> None:
+    """
+    Writes the vectors in the binary word2vec format, first to a temporary
+    file which then replaces the target, so that it is never incomplete.
+    """
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as out_file:
+        out_file.write(("%d %d\n" % vectors.shape).encode("utf-8"))
+        for word, vector in zip(words, vectors.astype(np.float32)):
+            out_file.write(word.encode("utf-8") + b" " + vector.tobytes())
+    os.replace(tmp_filename, filename)
+
+
+def export_embedding(w2v_model, vocab_file: str, path: str) -> None:
+    """
+    Exports the vectors as a matrix whose rows are aligned to the words of
+    an NMT vocabulary, along with a JSON header, which NMT uses to check
+    that the matrix matches its vocabulary. Words without a vector (e.g.
+    the special tokens of NMT) get zero vectors.
+    :param w2v_model: the trained model.
+    :param vocab_file: NMT vocabulary (one word per line).
+    :param path: path of the model, the suffixes are appended.
+    """
+    vocab = [word.strip() for word in read_file(vocab_file)]
+    embedding = np.zeros((len(vocab), w2v_model.wv.vector_size), np.float32)
+    num_missing = 0
+    for idx, word in enumerate(vocab):
+        if word in w2v_model.wv.vocab:
+            embedding[idx] = w2v_model.wv[word]
+        else:
+            num_missing += 1
+
+    header = {"vocab_file": os.path.abspath(vocab_file),
+              "vocab_size": len(vocab),
+              "vocab_hash": hashlib.sha1("\n".join(vocab).encode("utf-8")).hexdigest(),
+              "embed_size": w2v_model.wv.vector_size,
+              "num_missing": num_missing}
+    # header first, so that a matrix never exists without its header
+    with open(path + EMBED_HEADER_SUFFIX, "w", encoding="utf-8") as file:
+        json.dump(header, file, indent=2)
+    tmp_filename = path + EMBED_NPY_SUFFIX + ".tmp"
+    with open(tmp_filename, "wb") as out_file:
+        np.save(out_file, embedding)
+    os.replace(tmp_filename, path + EMBED_NPY_SUFFIX)
+    msg = "Embedding matrix written to: %s (%s of %s words without vector)" \
+          % (path + EMBED_NPY_SUFFIX, num_missing, len(vocab))
+    print(msg)
+    log.info(msg)
+
+
+def write_corpus_file(sentences: Sentences, filename: str) -> int:
+    """
+    Writes the sentences in the corpus_file format of gensim (one sentence
+    per line, words separated by spaces).
+    :return: the number of written sentences.
+    """
+    num_sentences = 0
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "w", encoding="utf-8") as out_file:
+        for sentence in sentences:
+            out_file.write(" ".join(sentence) + "\n")
+            num_sentences += 1
+    os.replace(tmp_filename, filename)
+    return num_sentences
 
 
 def log_closest(w2v_model, pos_words, neg_words) -> None:
@@ -162,14 +363,16 @@ def main():
     embed_dim = sys.argv[5]  # fifth argument = embedding dimension
     num_epochs = sys.argv[6]  # sixth argument = number of epochs
 
-    try:  # parse filename for whitelist
+    if len(sys.argv) > 7 and len(sys.argv[7]) != 0:  # parse filename for whitelist
         fname_wl = sys.argv[7]  # seventh argument = whitelist
         lines_wl = read_file(fname_wl)
         lines_wl = [word.lower().strip('\n')
                     for word in lines_wl]
         word_whitelist = set(lines_wl)
-    except IndexError:
+    else:
         print("No whitelist specified")
+    # eighth argument = NMT vocabulary to export an aligned embedding matrix for
+    fname_vocab = sys.argv[8] if len(sys.argv) > 8 else ""
 
     save_path_gs = fname_out
     save_path_logger = fname_log
@@ -186,37 +389,58 @@ def main():
     print("Number of epochs: %s" % epochs)
     log.info("Number of epochs: %s" % epochs)
 
-    lines = read_file(fname)
-    corpus_raw = parse_lines(lines)
-    corpus_raw = corpus_raw.lower()
-
     if IS_LOAD_MODEL:
         w2v_model = Word2Vec.load(save_path_gs)
+        if len(fname_vocab) != 0:
+            export_embedding(w2v_model, fname_vocab, save_path_gs)
         log_closest(w2v_model, FIND_SIMILAR_DN_POS, FIND_SIMILAR_DN_NEG)
         log_closest(w2v_model, FIND_SIMILAR_DT_POS, FIND_SIMILAR_DT_NEG)
     else:
-        # raw sentences is a list of sentences
-        corpus_raw = corpus_raw.replace("<s> ", "")
-        corpus_raw = corpus_raw.replace(" </s>", "")
-        raw_sentences = corpus_raw.split('\n')
-        del corpus_raw  # reclaim memory
-        sentences = []
-        for sentence in raw_sentences:
-            sentences.append(sentence.split())
-        _, sentences = generate_training_data(sentences, window_size)
+        # sentences are streamed from the corpus (filtered lazily)
+        sentences = Sentences(fname)
+        if IS_CORPUS_FILE:
+            corpus_file = save_path_gs + CORPUS_FILE_SUFFIX
+            num_sentences = write_corpus_file(sentences, corpus_file)
+            print("Corpus of %d sentences written to: %s" % (num_sentences, corpus_file))
+            corpus = {"corpus_file": corpus_file}
+        else:
+            corpus = {"sentences": sentences}
+        workers = NUM_WORKERS or os.cpu_count() or 1
+        log.info("Number of workers: %s" % workers)
         # start training of word2vec model via gensim
         epoch_logger = EpochLogger()
         epoch_saver = EpochSaver(save_path_gs)
+        speed_logger = SpeedLogger()
+        callbacks = [speed_logger, epoch_saver, epoch_logger]
+        early_stopping = EarlyStopping()
+        if IS_EARLY_STOPPING:
+            callbacks.append(early_stopping)
         # min_count = 2, data is being read via OCR, which produces errors
-        w2v_model = Word2Vec(sentences, min_count=2, size=embedding_dim, window=window_size)
+        w2v_model = Word2Vec(**corpus, min_count=2, size=embedding_dim, window=window_size,
+                             workers=workers)
+        if IS_CORPUS_FILE:
+            totals = {"total_words": w2v_model.corpus_total_words}
+        else:
+            totals = {"total_examples": w2v_model.corpus_count}
         try:
-            w2v_model.train(sentences, total_examples=len(sentences), epochs=epochs,
-                            compute_loss=True, callbacks=[epoch_saver, epoch_logger])
+            w2v_model.train(**corpus, **totals, epochs=epochs, compute_loss=True,
+                            callbacks=callbacks)
         except SystemExit:
             pass
         finally:  # save model
+            num_failed = epoch_saver.close()
+            if num_failed != 0:
+                print("%d checkpoint(s) not written, see log." % num_failed)
+            speed_msg = "Words/sec: %.0f (%s workers)" % (speed_logger.get_words_per_sec(), workers)
+            print(speed_msg)
+            log.info(speed_msg)
+            if early_stopping.get_stop_epoch() is not None:
+                with open(save_path_gs + STOP_FILE_SUFFIX, "w", encoding="utf-8") as file:
+                    file.write(str(early_stopping.get_stop_epoch()) + "\n")
             w2v_model.save(save_path_gs)
             w2v_model.wv.save_word2vec_format(save_path_gs + ".src")
+            if len(fname_vocab) != 0:
+                export_embedding(w2v_model, fname_vocab, save_path_gs)
             log_closest(w2v_model, FIND_SIMILAR_DN_POS, FIND_SIMILAR_DN_NEG)
             log_closest(w2v_model, FIND_SIMILAR_DT_POS, FIND_SIMILAR_DT_NEG)
 
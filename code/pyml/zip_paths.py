@@ -0,0 +1,121 @@
+"""
+author: Matthias Fussenegger
+
+Paths which lead into ZIP archives, e.g.
+data/comp/comp_b4_tt_tst.zip/NG3_k5/FOLDS_k5_1/FOLD1/MODEL/comp_test.txt
+Members of archives can be listed and read like files in directories,
+without extracting the archive first. Other paths are passed on to the
+file system. Each archive is opened only once per process.
+"""
+from typing import Dict, List, Optional, Tuple
+import io
+import os
+import re
+import zipfile
+
+ARCHIVE_SUFFIX = ".zip"
+REGEX_SEP = re.compile(r"[\\/]")
+
+# archives opened by this process
+open_archives: Dict[str, zipfile.ZipFile] = {}
+
+
+def split_path(path: str) -> Tuple[Optional[str], str]:
+    """
+    :return: tuple of (archive, member path) if the path leads into an
+    archive, otherwise (None, path). The member path uses slashes and
+    is empty for the root of the archive.
+    """
+    parts = REGEX_SEP.split(path)
+    for i in range(1, len(parts) + 1):
+        if parts[i - 1].lower().endswith(ARCHIVE_SUFFIX):
+            archive = os.sep.join(parts[:i])
+            if os.path.isfile(archive):
+                return archive, "/".join([p for p in parts[i:] if p])
+    return None, path
+
+
+def is_in_archive(path: str) -> bool:
+    return split_path(path)[0] is not None
+
+
+def get_archive(archive: str) -> zipfile.ZipFile:
+    zip_file = open_archives.get(archive)
+    if zip_file is None:
+        zip_file = zipfile.ZipFile(archive)
+        open_archives[archive] = zip_file
+    return zip_file
+
+
+def get_local_dir(path: str) -> str:
+    """
+    :return: the directory of the archive if the path leads into an
+    archive (e.g. to write results to), otherwise the path itself.
+    """
+    archive, _ = split_path(path)
+    return os.path.dirname(archive) if archive is not None else path
+
+
+def list_dir(path: str) -> List[Tuple[str, bool]]:
+    """
+    Lists a directory on disk or in an archive. Directories of archives
+    do not need to have their own entries.
+    :return: list of tuples of (<name>, <is directory>).
+    """
+    archive, member = split_path(path)
+    if archive is None:
+        with os.scandir(path) as entries:
+            return [(entry.name, entry.is_dir()) for entry in entries]
+
+    prefix = member + "/" if member else ""
+    children: Dict[str, bool] = {}
+    for name in get_archive(archive).namelist():
+        if name.startswith(prefix) and len(name) > len(prefix):
+            child, sep, _ = name[len(prefix):].partition("/")
+            children[child] = children.get(child, False) or sep == "/"
+    return list(children.items())
+
+
+def get_info(path: str) -> Optional[zipfile.ZipInfo]:
+    archive, member = split_path(path)
+    try:
+        return get_archive(archive).getinfo(member)
+    except KeyError:
+        return None
+
+
+def exists(path: str) -> bool:
+    if not is_in_archive(path):
+        return os.path.exists(path)
+    return get_info(path) is not None
+
+
+def get_stat_key(path: str) -> Optional[List[int]]:
+    """
+    :return: key which changes whenever the file changes (modification
+    time and size) or None if there is no such file.
+    """
+    archive, member = split_path(path)
+    try:
+        file_stat = os.stat(archive if archive is not None else path)
+    except OSError:
+        return None
+    if archive is None:
+        return [file_stat.st_mtime_ns, file_stat.st_size]
+    info = get_info(path)
+    if info is None:
+        return None
+    return [file_stat.st_mtime_ns, info.file_size, info.CRC]
+
+
+def read_lines(path: str, encoding: str = "utf-8") -> List[str]:
+    """
+    Reads all lines of a file on disk or in an archive, line endings
+    are translated as when reading a text file.
+    """
+    archive, member = split_path(path)
+    if archive is None:
+        with open(path, "r", encoding=encoding) as file:
+            return file.readlines()
+    with get_archive(archive).open(member) as member_file:
+        return io.TextIOWrapper(member_file, encoding=encoding).readlines()
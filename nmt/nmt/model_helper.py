@@ -23,7 +23,6 @@ import numpy as np
 import six
 import tensorflow as tf
 
-from tensorflow.python.ops import lookup_ops
 from .utils import iterator_utils
 from .utils import misc_utils as utils
 from .utils import vocab_utils
@@ -91,8 +90,10 @@ def create_train_model(
     src_vocab_table, tgt_vocab_table = vocab_utils.create_vocab_tables(
         src_vocab_file, tgt_vocab_file, hparams.share_vocab)
 
-    src_dataset = tf.data.TextLineDataset(tf.gfile.Glob(src_file))
-    tgt_dataset = tf.data.TextLineDataset(tf.gfile.Glob(tgt_file))
+    src_dataset = tf.data.TextLineDataset(
+        iterator_utils.get_data_files(src_file))
+    tgt_dataset = tf.data.TextLineDataset(
+        iterator_utils.get_data_files(tgt_file))
     skip_count_placeholder = tf.placeholder(shape=(), dtype=tf.int64)
 
     iterator = iterator_utils.get_iterator(
@@ -149,8 +150,8 @@ def create_eval_model(model_creator, hparams, scope=None, extra_args=None):
   with graph.as_default(), tf.container(scope or "eval"):
     src_vocab_table, tgt_vocab_table = vocab_utils.create_vocab_tables(
         src_vocab_file, tgt_vocab_file, hparams.share_vocab)
-    reverse_tgt_vocab_table = lookup_ops.index_to_string_table_from_file(
-        tgt_vocab_file, default_value=vocab_utils.UNK)
+    reverse_tgt_vocab_table = vocab_utils.create_reverse_vocab_table(
+        tgt_vocab_file)
 
     src_file_placeholder = tf.placeholder(shape=(), dtype=tf.string)
     tgt_file_placeholder = tf.placeholder(shape=(), dtype=tf.string)
@@ -202,8 +203,8 @@ def create_infer_model(model_creator, hparams, scope=None, extra_args=None):
   with graph.as_default(), tf.container(scope or "infer"):
     src_vocab_table, tgt_vocab_table = vocab_utils.create_vocab_tables(
         src_vocab_file, tgt_vocab_file, hparams.share_vocab)
-    reverse_tgt_vocab_table = lookup_ops.index_to_string_table_from_file(
-        tgt_vocab_file, default_value=vocab_utils.UNK)
+    reverse_tgt_vocab_table = vocab_utils.create_reverse_vocab_table(
+        tgt_vocab_file)
 
     src_placeholder = tf.placeholder(shape=[None], dtype=tf.string)
     batch_size_placeholder = tf.placeholder(shape=[], dtype=tf.int64)
@@ -248,7 +249,8 @@ def _create_pretrained_emb_from_txt(
   """Load pretrain embeding from embed_file, and return an embedding matrix.
 
   Args:
-    embed_file: Path to a Glove formated embedding txt file.
+    embed_file: Path to a Glove formated embedding txt file or to a binary
+      .npy embedding matrix which is aligned to the vocab file.
     num_trainable_tokens: Make the first n tokens in the vocab file as trainable
       variables. Default is 3, which is "<unk>", "<s>" and "</s>".
   """
@@ -258,14 +260,31 @@ def _create_pretrained_emb_from_txt(
   utils.print_out("# Using pretrained embedding: %s." % embed_file)
   utils.print_out("  with trainable tokens: ")
 
-  emb_dict, emb_size = vocab_utils.load_embed_txt(embed_file)
-  for token in trainable_tokens:
-    utils.print_out("    %s" % token)
-    if token not in emb_dict:
-      emb_dict[token] = [0.0] * emb_size
-
-  emb_mat = np.array(
-      [emb_dict[token] for token in vocab], dtype=dtype.as_numpy_dtype())
+  emb_mat = None
+  if vocab_utils.is_embed_npy(embed_file):
+    try:
+      emb_mat, emb_size = vocab_utils.load_embed_npy(embed_file, vocab)
+    except ValueError as e:
+      # e.g. the vocab has changed since the matrix was exported
+      txt_file = vocab_utils.get_embed_txt_file(embed_file)
+      if not tf.gfile.Exists(txt_file):
+        raise
+      utils.print_out("# WARNING: %s Using %s instead." % (e, txt_file))
+      embed_file = txt_file
+
+  if emb_mat is not None:
+    for token in trainable_tokens:
+      utils.print_out("    %s" % token)
+    emb_mat = np.asarray(emb_mat, dtype=dtype.as_numpy_dtype())
+  else:
+    emb_dict, emb_size = vocab_utils.load_embed_txt(embed_file)
+    for token in trainable_tokens:
+      utils.print_out("    %s" % token)
+      if token not in emb_dict:
+        emb_dict[token] = [0.0] * emb_size
+
+    emb_mat = np.array(
+        [emb_dict[token] for token in vocab], dtype=dtype.as_numpy_dtype())
   emb_mat = tf.constant(emb_mat)
   emb_mat_const = tf.slice(emb_mat, [num_trainable_tokens, 0], [-1, -1])
   with tf.variable_scope(scope or "pretrain_embeddings", dtype=dtype) as scope:
@@ -159,7 +159,8 @@ def add_arguments(parser):
       """)
   parser.add_argument("--embed_prefix", type=str, default=None, help="""\
       Pretrained embedding prefix, expect files with src/tgt suffixes.
-      The embedding files should be Glove formated txt files.\
+      The embedding files should be Glove formated txt files or binary
+      .npy matrices aligned to the vocab (with suffixes src.npy/tgt.npy).\
       """)
   parser.add_argument("--sos", type=str, default="<s>",
                       help="Start-of-sentence symbol.")
@@ -519,8 +520,11 @@ def extend_hparams(hparams):
   _add_argument(hparams, "src_embed_file", "")
   _add_argument(hparams, "tgt_embed_file", "")
   if getattr(hparams, "embed_prefix", None):
-    src_embed_file = hparams.embed_prefix + "." + hparams.src
-    tgt_embed_file = hparams.embed_prefix + "." + hparams.tgt
+    # prefer binary embedding matrices (.npy) to txt files
+    src_embed_file = vocab_utils.get_embed_file(
+        hparams.embed_prefix + "." + hparams.src)
+    tgt_embed_file = vocab_utils.get_embed_file(
+        hparams.embed_prefix + "." + hparams.tgt)
 
     if tf.gfile.Exists(src_embed_file):
       utils.print_out("  src_embed_file %s exist" % src_embed_file)
@@ -15,14 +15,20 @@
 """For loading data into NMT models."""
 from __future__ import print_function
 
+import codecs
 import collections
+import os
 
 import tensorflow as tf
 
 from ..utils import vocab_utils
 
 
-__all__ = ["BatchedInput", "get_iterator", "get_infer_iterator"]
+__all__ = ["BatchedInput", "get_iterator", "get_infer_iterator",
+           "get_data_files"]
+
+# suffix of a manifest listing the chunk files of a data file
+CHUNKS_SUFFIX = ".chunks"
 
 
 # NOTE(ebrevdo): When we subclass this, instances' __dict__ becomes empty.
@@ -34,6 +40,34 @@ class BatchedInput(
   pass
 
 
+def get_data_files(data_file):
+  """Resolve a data file into the list of files to read.
+
+  A data file which is stored as a list of shared chunks is described by a
+  manifest (data_file + CHUNKS_SUFFIX). Each line of the manifest is the path
+  of a chunk file relative to the manifest. If there is no manifest,
+  data_file is treated as a glob pattern.
+
+  Args:
+    data_file: path or glob pattern of the data file.
+
+  Returns:
+    A list of file paths, which can be passed to TextLineDataset.
+  """
+  manifest_file = data_file + CHUNKS_SUFFIX
+  if not tf.gfile.Exists(manifest_file):
+    return tf.gfile.Glob(data_file)
+
+  base_dir = os.path.dirname(manifest_file)
+  data_files = []
+  with codecs.getreader("utf-8")(tf.gfile.GFile(manifest_file, "rb")) as f:
+    for line in f:
+      chunk_file = line.strip()
+      if chunk_file:
+        data_files.append(os.path.join(base_dir, chunk_file))
+  return data_files
+
+
 def get_infer_iterator(src_dataset,
                        src_vocab_table,
                        batch_size,
@@ -19,6 +19,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+
 import tensorflow as tf
 
 from tensorflow.python.ops import lookup_ops
@@ -316,6 +318,31 @@ class IteratorUtilsTest(tf.test.TestCase):
       with self.assertRaisesOpError("End of sequence"):
         sess.run((source, seq_len))
 
+  def testGetDataFiles(self):
+    data_dir = os.path.join(tf.test.get_temp_dir(), "data_files")
+    chunk_dir = os.path.join(data_dir, "CHUNKS")
+    fold_dir = os.path.join(data_dir, "FOLD1")
+    tf.gfile.MakeDirs(chunk_dir)
+    tf.gfile.MakeDirs(fold_dir)
+    for name in ["a.src", "b.src"]:
+      with tf.gfile.GFile(os.path.join(chunk_dir, name), "w") as f:
+        f.write("c c a\n")
+
+    # Without manifest the data file is used as is
+    plain_file = os.path.join(fold_dir, "dev.src")
+    with tf.gfile.GFile(plain_file, "w") as f:
+      f.write("c a\n")
+    self.assertEqual([plain_file], iterator_utils.get_data_files(plain_file))
+
+    # With manifest the chunk files are resolved relative to it
+    train_file = os.path.join(fold_dir, "train.src")
+    with tf.gfile.GFile(train_file + iterator_utils.CHUNKS_SUFFIX, "w") as f:
+      f.write("../CHUNKS/a.src\n../CHUNKS/b.src\n")
+    self.assertEqual(
+        [os.path.join(fold_dir, "../CHUNKS/a.src"),
+         os.path.join(fold_dir, "../CHUNKS/b.src")],
+        iterator_utils.get_data_files(train_file))
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -20,7 +20,12 @@ from __future__ import division
 from __future__ import print_function
 
 import codecs
+import hashlib
+import json
 import os
+import tempfile
+import uuid
+import numpy as np
 import tensorflow as tf
 
 from tensorflow.python.ops import lookup_ops
@@ -33,6 +38,13 @@ SOS = "<s>"
 EOS = "</s>"
 UNK_ID = 0
 
+# compiled vocab, stored next to the vocab file
+VOCAB_CACHE_SUFFIX = ".vocab.npy"
+
+# embedding matrix aligned to a vocab and its header (see word2vec/train.py)
+EMBED_NPY_SUFFIX = ".npy"
+EMBED_HEADER_SUFFIX = ".json"
+
 # char ids 0-255 come from utf-8 encoding bytes
 # assign 256-300 to special chars
 BOS_CHAR_ID = 256  # <begin sentence>
@@ -98,14 +110,89 @@ def tokens_to_bytes(tokens):
   return as_bytes
 
 
-def load_vocab(vocab_file):
+# vocab_file -> (mtime of vocab_file, words), shared by all graphs of a process
+_vocab_cache = {}
+
+
+def _read_vocab_txt(vocab_file):
   vocab = []
   with codecs.getreader("utf-8")(tf.gfile.GFile(vocab_file, "rb")) as f:
-    vocab_size = 0
     for word in f:
-      vocab_size += 1
       vocab.append(word.strip())
-  return vocab, vocab_size
+  return vocab
+
+
+def _compile_vocab(vocab_file, cache_file):
+  """Read vocab_file and store its words as a binary .npy array."""
+  vocab = np.array(_read_vocab_txt(vocab_file), dtype="U")
+  # each process writes its own tmp file, as folds may share the vocab file
+  tmp_file = None
+  try:
+    cache_dir = os.path.dirname(os.path.abspath(cache_file))
+    if os.path.isdir(cache_dir):
+      fd, tmp_file = tempfile.mkstemp(
+          suffix=".tmp", prefix=os.path.basename(cache_file), dir=cache_dir)
+      os.close(fd)
+    else:  # not on a local file system
+      tmp_file = "%s.%s.tmp" % (cache_file, uuid.uuid4().hex)
+    with tf.gfile.GFile(tmp_file, "wb") as f:
+      np.save(f, vocab)
+    tf.gfile.Rename(tmp_file, cache_file, overwrite=True)
+  except (tf.errors.OpError, IOError, OSError) as e:
+    utils.print_out("# Can't write compiled vocab %s: %s" % (cache_file, e))
+    if tmp_file is not None and tf.gfile.Exists(tmp_file):
+      tf.gfile.Remove(tmp_file)
+  return vocab
+
+
+def _load_compiled_vocab(cache_file):
+  """Load a compiled vocab, return None if it is corrupt."""
+  try:
+    if os.path.isfile(cache_file):
+      return np.load(cache_file, mmap_mode="r")
+    with tf.gfile.GFile(cache_file, "rb") as f:  # not on a local file system
+      return np.load(f)
+  except (tf.errors.OpError, IOError, OSError, ValueError, EOFError) as e:
+    utils.print_out("# Compiled vocab %s is corrupt: %s" % (cache_file, e))
+    return None
+
+
+def load_vocab_array(vocab_file):
+  """Load the words of vocab_file as a numpy array of strings.
+
+  The words are compiled once into a binary file next to vocab_file (which is
+  memory-mapped when loaded) and kept per process, so that the train, eval and
+  infer graphs do not read and split the text file again. The compiled file is
+  rebuilt whenever vocab_file is newer.
+
+  The words are kept in vocab order, not sorted, as the index of a word is its
+  id. No hash index is stored along with them, the vocab tables build their
+  own (in the graph) from this array via index_table_from_tensor.
+
+  Args:
+    vocab_file: path to the vocab file, one word per line.
+  Returns:
+    a numpy array of the words, the index of a word is its id.
+  """
+  mtime = tf.gfile.Stat(vocab_file).mtime_nsec
+  cached = _vocab_cache.get(vocab_file)
+  if cached is not None and cached[0] == mtime:
+    return cached[1]
+
+  cache_file = vocab_file + VOCAB_CACHE_SUFFIX
+  vocab = None
+  if (tf.gfile.Exists(cache_file) and
+      tf.gfile.Stat(cache_file).mtime_nsec >= mtime):
+    vocab = _load_compiled_vocab(cache_file)
+  if vocab is None:  # missing, outdated or corrupt
+    vocab = _compile_vocab(vocab_file, cache_file)
+  _vocab_cache[vocab_file] = (mtime, vocab)
+  return vocab
+
+
+def load_vocab(vocab_file):
+  vocab = load_vocab_array(vocab_file).tolist()
+  return vocab, len(vocab)
 
 
 def check_vocab(vocab_file, out_dir, check_special_token=True, sos=None,
@@ -133,6 +220,8 @@ def check_vocab(vocab_file, out_dir, check_special_token=True, sos=None,
           for word in vocab:
             f.write("%s\n" % word)
         vocab_file = new_vocab_file
+        _vocab_cache[vocab_file] = (tf.gfile.Stat(vocab_file).mtime_nsec,
+                                    np.array(vocab, dtype="U"))
   else:
     raise ValueError("vocab_file '%s' does not exist." % vocab_file)
 
@@ -142,16 +231,22 @@ def check_vocab(vocab_file, out_dir, check_special_token=True, sos=None,
 
 def create_vocab_tables(src_vocab_file, tgt_vocab_file, share_vocab):
   """Creates vocab tables for src_vocab_file and tgt_vocab_file."""
-  src_vocab_table = lookup_ops.index_table_from_file(
-      src_vocab_file, default_value=UNK_ID)
+  src_vocab_table = lookup_ops.index_table_from_tensor(
+      load_vocab_array(src_vocab_file), default_value=UNK_ID)
   if share_vocab:
     tgt_vocab_table = src_vocab_table
   else:
-    tgt_vocab_table = lookup_ops.index_table_from_file(
-        tgt_vocab_file, default_value=UNK_ID)
+    tgt_vocab_table = lookup_ops.index_table_from_tensor(
+        load_vocab_array(tgt_vocab_file), default_value=UNK_ID)
   return src_vocab_table, tgt_vocab_table
 
 
+def create_reverse_vocab_table(vocab_file):
+  """Creates a table which maps the ids of vocab_file to their words."""
+  return lookup_ops.index_to_string_table_from_tensor(
+      load_vocab_array(vocab_file), default_value=UNK)
+
+
 def load_embed_txt(embed_file):
   """Load embed_file into a python dictionary.
 
@@ -192,3 +287,66 @@ def load_embed_txt(embed_file):
       else:
         emb_size = len(vec)
   return emb_dict, emb_size
+
+
+def get_vocab_hash(vocab):
+  """Hash of the words of a vocab, to check that an embedding matches it."""
+  return hashlib.sha1("\n".join(vocab).encode("utf-8")).hexdigest()
+
+
+def get_embed_file(embed_file):
+  """Return the binary embedding matrix of embed_file if there is one."""
+  if tf.gfile.Exists(embed_file + EMBED_NPY_SUFFIX):
+    return embed_file + EMBED_NPY_SUFFIX
+  return embed_file
+
+
+def is_embed_npy(embed_file):
+  return embed_file.endswith(EMBED_NPY_SUFFIX)
+
+
+def get_embed_txt_file(embed_file):
+  """Return the txt embedding file next to a binary embedding matrix."""
+  return embed_file[:-len(EMBED_NPY_SUFFIX)]
+
+
+def load_embed_npy(embed_file, vocab):
+  """Load a binary embedding matrix which is aligned to vocab.
+
+  The matrix is a .npy file whose rows are the embeddings of the words of the
+  vocab (in the same order), next to a JSON header with the suffix .json
+  instead of .npy, which holds vocab_size, embed_size and vocab_hash.
+
+  Words of the vocab without a vector in the txt file have zero vectors in
+  the matrix, whereas loading the txt file fails on them.
+
+  Args:
+    embed_file: path to the .npy file, which is memory-mapped if local.
+    vocab: the words of the vocab, as loaded by load_vocab.
+  Returns:
+    the embedding matrix and the size of embedding dimensions.
+  Raises:
+    ValueError: if the matrix does not match the vocab.
+  """
+  header_file = get_embed_txt_file(embed_file) + EMBED_HEADER_SUFFIX
+  with codecs.getreader("utf-8")(tf.gfile.GFile(header_file, "rb")) as f:
+    header = json.load(f)
+  if (header["vocab_size"] != len(vocab) or
+      header["vocab_hash"] != get_vocab_hash(vocab)):
+    raise ValueError("embed_file '%s' does not match the vocab." % embed_file)
+
+  if os.path.isfile(embed_file):
+    emb_mat = np.load(embed_file, mmap_mode="r")
+  else:  # not on a local file system
+    with tf.gfile.GFile(embed_file, "rb") as f:
+      emb_mat = np.load(f)
+  emb_size = header["embed_size"]
+  if emb_mat.shape != (len(vocab), emb_size):
+    raise ValueError("embed_file '%s' has shape %s instead of %s." %
+                     (embed_file, emb_mat.shape, (len(vocab), emb_size)))
+  num_missing = header.get("num_missing", 0)
+  if num_missing:
+    utils.print_out("# %d of %d words have no pretrained vector in %s, "
+                    "their embeddings are zero-filled" %
+                    (num_missing, len(vocab), embed_file))
+  return emb_mat, emb_size
@@ -20,7 +20,9 @@ from __future__ import division
 from __future__ import print_function
 
 import codecs
+import json
 import os
+import numpy as np
 import tensorflow as tf
 
 from ..utils import vocab_utils
@@ -52,6 +54,79 @@ class VocabUtilsTest(tf.test.TestCase):
     self.assertEqual(
         [vocab_utils.UNK, vocab_utils.SOS, vocab_utils.EOS] + vocab, new_vocab)
 
+  def testLoadVocabCompiled(self):
+    vocab_file = os.path.join(tf.test.get_temp_dir(), "vocab_compiled")
+    vocab = [vocab_utils.UNK, vocab_utils.SOS, vocab_utils.EOS, "a", "b"]
+    with codecs.getwriter("utf-8")(tf.gfile.GFile(vocab_file, "wb")) as f:
+      for word in vocab:
+        f.write("%s\n" % word)
+
+    loaded, vocab_size = vocab_utils.load_vocab(vocab_file)
+    self.assertEqual(vocab, loaded)
+    self.assertEqual(len(vocab), vocab_size)
+    self.assertTrue(
+        tf.gfile.Exists(vocab_file + vocab_utils.VOCAB_CACHE_SUFFIX))
+
+    # Reading again in the same process must not re-read the text file
+    self.assertIs(vocab_utils.load_vocab_array(vocab_file),
+                  vocab_utils.load_vocab_array(vocab_file))
+
+  def testLoadVocabCompiledCorrupt(self):
+    vocab_file = os.path.join(tf.test.get_temp_dir(), "vocab_corrupt")
+    vocab = [vocab_utils.UNK, vocab_utils.SOS, vocab_utils.EOS, "a", "b"]
+    with codecs.getwriter("utf-8")(tf.gfile.GFile(vocab_file, "wb")) as f:
+      for word in vocab:
+        f.write("%s\n" % word)
+    # Truncated compiled vocab, written after the vocab file
+    cache_file = vocab_file + vocab_utils.VOCAB_CACHE_SUFFIX
+    with open(cache_file, "wb") as f:
+      f.write(b"\x93NUMPY")
+
+    # Assert: the compiled vocab is rebuilt instead of failing
+    loaded, _ = vocab_utils.load_vocab(vocab_file)
+    self.assertEqual(vocab, loaded)
+    self.assertEqual(vocab, np.load(cache_file).tolist())
+
+  def testCreateVocabTables(self):
+    vocab_file = os.path.join(tf.test.get_temp_dir(), "vocab_tables")
+    vocab = [vocab_utils.UNK, vocab_utils.SOS, vocab_utils.EOS, "a", "b"]
+    with codecs.getwriter("utf-8")(tf.gfile.GFile(vocab_file, "wb")) as f:
+      for word in vocab:
+        f.write("%s\n" % word)
+
+    src_vocab_table, tgt_vocab_table = vocab_utils.create_vocab_tables(
+        vocab_file, vocab_file, share_vocab=True)
+    reverse_vocab_table = vocab_utils.create_reverse_vocab_table(vocab_file)
+    ids = src_vocab_table.lookup(tf.constant(["a", "b", "c", "</s>"]))
+    words = reverse_vocab_table.lookup(tf.constant([3, 4, 9], tf.int64))
+
+    with self.test_session() as sess:
+      sess.run(tf.tables_initializer())
+      self.assertIs(src_vocab_table, tgt_vocab_table)
+      self.assertAllEqual([3, 4, vocab_utils.UNK_ID, 2], sess.run(ids))
+      self.assertAllEqual([b"a", b"b", b"<unk>"], sess.run(words))
+
+  def testLoadEmbedNpy(self):
+    embed_dir = os.path.join(tf.test.get_temp_dir(), "embed_dir")
+    os.makedirs(embed_dir)
+    embed_file = os.path.join(embed_dir, "embed.src.npy")
+    vocab = [vocab_utils.UNK, vocab_utils.SOS, vocab_utils.EOS, "a", "b"]
+    emb_mat = np.arange(10, dtype=np.float32).reshape(5, 2)
+    np.save(embed_file, emb_mat)
+    with open(os.path.join(embed_dir, "embed.src.json"), "w") as f:
+      json.dump({"vocab_size": 5, "embed_size": 2,
+                 "vocab_hash": vocab_utils.get_vocab_hash(vocab)}, f)
+
+    self.assertEqual(embed_file, vocab_utils.get_embed_file(embed_file[:-4]))
+    self.assertEqual(embed_file[:-4], vocab_utils.get_embed_txt_file(embed_file))
+    loaded, emb_size = vocab_utils.load_embed_npy(embed_file, vocab)
+    self.assertEqual(2, emb_size)
+    self.assertAllEqual(emb_mat, loaded)
+
+    # Assert: a different vocab is rejected
+    with self.assertRaises(ValueError):
+      vocab_utils.load_embed_npy(embed_file, vocab[:3] + ["b", "a"])
+
 
 if __name__ == "__main__":
   tf.test.main()